@@ -0,0 +1,277 @@
+"""
+Стратегии стрельбы компьютера.
+
+Каждая стратегия умеет две вещи:
+- choose_shot() - выбрать клетку (x, y), в которую еще не стреляли
+- observe(x, y, result, sunk) - узнать результат выстрела (MISS или HIT)
+  и потопленный этим выстрелом корабль (engine.Ship или None)
+
+RandomAI стреляет наугад (как раньше), ProbabilityAI ищет корабли
+по карте вероятностей, MonteCarloAI - по случайным расстановкам флота
+(montecarlo.py). Нужную выбирает make_ai по уровню сложности.
+"""
+
+import random
+
+import numpy as np
+
+from engine import HIT, MISS
+from montecarlo import MonteCarloPlanner
+from placement import placement_table
+from tables import cached_table
+
+
+class RandomAI:
+    """
+    Случайные выстрелы, каждая клетка не больше одного раза
+    """
+
+    def __init__(self, grid_size, ships, rng=random):
+        self.grid_size = grid_size
+        self.random = rng
+        # клетки, в которые еще не стреляли, - это первые remaining позиций
+        # "списка" всех клеток; выбрать и вычеркнуть клетку можно за O(1)
+        # без повторных попыток. Список не хранится целиком: в moved и
+        # position записаны только позиции, где клетка не совпадает со своим
+        # номером, так что память зависит от числа выстрелов, а не от поля
+        self.remaining = grid_size * grid_size
+        self.moved = {}  # позиция -> клетка
+        self.position = {}  # клетка -> позиция (-1 - сюда уже стреляли)
+
+    def choose_shot(self):
+        index = int(self.random.random() * self.remaining)
+        cell = self.moved.get(index, index)
+        return cell % self.grid_size, cell // self.grid_size
+
+    def observe(self, x, y, result, sunk=None):
+        self._forget(y * self.grid_size + x)
+        if sunk is not None:
+            # вокруг потопленного корабля движок сам ставит промахи
+            for i, j in sunk.halo(self.grid_size):
+                self._forget(j * self.grid_size + i)
+
+    def _forget(self, cell):
+        # меняем местами с последней клеткой и укорачиваем список
+        index = self.position.get(cell, cell)
+        if index < 0:
+            return
+        self.remaining -= 1
+        last = self.moved.pop(self.remaining, self.remaining)
+        if last != cell:
+            self.moved[index] = last
+            self.position[last] = index
+        self.position[cell] = -1
+
+
+class ProbabilityAI:
+    """
+    Охота и добивание по карте вероятностей
+
+    Для каждой клетки хранится, сколько еще возможных расстановок
+    оставшихся кораблей ее накрывают. После выстрела пересчитываются
+    только расстановки, которые этот выстрел задел, а не вся карта.
+    - охота: стреляем в клетку, которую накрывает больше всего расстановок
+    - добивание: если есть подбитые клетки, стреляем рядом с ними
+      по расстановкам, которые проходят через попадания
+    """
+
+    def __init__(self, grid_size, ships, rng=random):
+        self.grid_size = grid_size
+        self.random = rng
+        self.table = table = placement_table(grid_size, tuple(sorted(ships)))
+        self.touching = touching_index(grid_size, tuple(sorted(ships)))
+
+        sizes = sorted(table.by_size)
+        self.size_index = {size: index for index, size in enumerate(sizes)}
+        # сколько кораблей каждого размера еще плавает (вес расстановки)
+        self.weights = np.array([ships[size] for size in sizes], dtype=np.int64)
+
+        cells = grid_size * grid_size
+        self.shot = np.zeros(cells, dtype=bool)
+        self.hits = set()  # попадания по еще не потопленным кораблям
+
+        # coverage[i, клетка] - сколько живых расстановок размера sizes[i]
+        # накрывают клетку
+        self.coverage = np.zeros((len(sizes), cells), dtype=np.int64)
+        self.alive = bytearray(len(table.placements))
+        self._revive(range(len(table.placements)))
+        # чтобы случайно выбирать среди одинаково хороших клеток
+        self.noise = np.array([rng.random() for _ in range(cells)]) * 1e-3
+
+    def choose_shot(self):
+        cell = self._target()
+        if cell is None:
+            # охота: сумма по размерам "расстановки x сколько кораблей осталось"
+            density = self.weights @ self.coverage + self.noise
+            density[self.shot] = -1.0
+            cell = int(density.argmax())
+        return cell % self.grid_size, cell // self.grid_size
+
+    def _target(self):
+        """
+        Добивание: лучшая клетка рядом с попаданиями или None
+        """
+        if not self.hits:
+            return None
+        table = self.table
+        scores = {}
+        for hit in list(self.hits):
+            found = False
+            for placement_id in table.covering[hit]:
+                if not self.alive[placement_id]:
+                    continue
+                size = table.placements[placement_id][2]
+                weight = self.weights[self.size_index[size]]
+                for cell in table.cells[placement_id]:
+                    if not self.shot[cell]:
+                        scores[cell] = scores.get(cell, 0) + weight
+                        found = True
+            if not found:
+                # через это попадание больше не проходит ни одна расстановка
+                # с необстрелянными клетками - корабль, видимо, уже потоплен
+                self.hits.discard(hit)
+        if not scores:
+            return None
+        return max(scores, key=lambda cell: scores[cell] + self.noise[cell])
+
+    def observe(self, x, y, result, sunk=None):
+        cell = y * self.grid_size + x
+        self.shot[cell] = True
+        if result == MISS:
+            # здесь пусто - не подходит ни одна расстановка через эту клетку
+            self._kill(self.table.covering[cell])
+        elif result == HIT:
+            self.hits.add(cell)
+            # корабли не касаются друг друга, поэтому рядом с попаданием
+            # может быть только тот же самый корабль: убираем расстановки,
+            # у которых эта клетка попадает в ореол, а не в сам корабль
+            self._kill(self.touching[cell])
+        if sunk is not None:
+            self._sunk(sunk)
+
+    def _sunk(self, ship):
+        """
+        Корабль потоплен: кораблей его размера стало меньше, его клетки
+        больше не ждут добивания, а вокруг него точно пусто
+        """
+        self.weights[self.size_index[ship.size]] -= 1
+        grid_size = self.grid_size
+        for i, j in ship.cells + ship.halo(grid_size):
+            cell = j * grid_size + i
+            self.shot[cell] = True
+            self.hits.discard(cell)
+            self._kill(self.table.covering[cell])
+
+    def _kill(self, placement_ids):
+        """
+        Вычеркивает расстановки и уменьшает счетчики их клеток
+        """
+        self._update(placement_ids, 1, 0, -1)
+
+    def _revive(self, placement_ids):
+        """
+        Возвращает расстановки и увеличивает счетчики их клеток
+        """
+        self._update(placement_ids, 0, 1, 1)
+
+    def _update(self, placement_ids, old_state, new_state, delta):
+        table = self.table
+        rows = []
+        cells = []
+        for placement_id in placement_ids:
+            if self.alive[placement_id] == old_state:
+                self.alive[placement_id] = new_state
+                placement_cells = table.cells[placement_id]
+                row = self.size_index[table.placements[placement_id][2]]
+                rows.extend([row] * len(placement_cells))
+                cells.extend(placement_cells)
+        if cells:
+            np.add.at(self.coverage, (rows, cells), delta)
+
+
+class MonteCarloAI(ProbabilityAI):
+    """
+    Сильный уровень: стреляет в клетку, которая чаще всего оказывается
+    под кораблем в случайных расстановках, согласных с наблюдениями
+    (считает montecarlo.py за отведенное время). Если ни одной расстановки
+    найти не успели, стреляет как ProbabilityAI
+    """
+
+    def __init__(
+        self, grid_size, ships, rng=random, budget=None, workers=None, samples=None
+    ):
+        """
+        budget - сколько секунд думать над выстрелом
+        workers - сколько процессов считают вместе с текущим потоком
+        samples - считать ровно столько расстановок (повторяемо, без пула)
+        """
+        super().__init__(grid_size, ships, rng)
+        self.planner = MonteCarloPlanner(grid_size, ships, budget, workers, samples)
+        self.blocked = bytearray(grid_size * grid_size)  # промахи и ореолы
+        self.open_hits = set()  # попадания по непотопленным кораблям
+        self.ships_left = dict(ships)
+
+    def choose_shot(self):
+        counts, samples = self.planner.plan(
+            self.blocked, self.open_hits, self.ships_left, self.random
+        )
+        if samples == 0:
+            return super().choose_shot()
+        score = counts + self.noise
+        score[self.shot] = -1.0
+        cell = int(score.argmax())
+        return cell % self.grid_size, cell // self.grid_size
+
+    def observe(self, x, y, result, sunk=None):
+        super().observe(x, y, result, sunk)
+        cell = y * self.grid_size + x
+        if result == MISS:
+            self.blocked[cell] = 1
+        elif result == HIT:
+            self.open_hits.add(cell)
+        if sunk is not None:
+            self.ships_left[sunk.size] -= 1
+            for i, j in sunk.cells + sunk.halo(self.grid_size):
+                cell = j * self.grid_size + i
+                self.blocked[cell] = 1
+                self.open_hits.discard(cell)
+
+
+def touching_index(grid_size, sizes):
+    """
+    Для каждой клетки - расстановки, у которых эта клетка в ореоле,
+    но не в самом корабле (строится один раз, см. tables.py)
+    """
+    return cached_table("touching", _build_touching_index, grid_size, sizes)
+
+
+def _build_touching_index(grid_size, sizes):
+    table = placement_table(grid_size, sizes)
+    touching = [[] for _ in range(grid_size * grid_size)]
+    for placement_id, zone in enumerate(table.zones):
+        ship_cells = set(table.cells[placement_id])
+        for cell in zone:
+            if cell not in ship_cells:
+                touching[cell].append(placement_id)
+    return touching
+
+
+# уровни сложности компьютера
+DIFFICULTIES = {
+    "random": RandomAI,
+    "smart": ProbabilityAI,
+    "montecarlo": MonteCarloAI,
+}
+
+
+def make_ai(difficulty, grid_size, ships, rng=random, **options):
+    """
+    Создает стратегию по названию уровня сложности
+    options - настройки стратегии (например, samples для MonteCarloAI)
+    """
+    if difficulty not in DIFFICULTIES:
+        raise ValueError(
+            f"Неизвестный уровень сложности: {difficulty} "
+            f"(есть: {', '.join(DIFFICULTIES)})"
+        )
+    return DIFFICULTIES[difficulty](grid_size, ships, rng, **options)
@@ -0,0 +1,195 @@
+"""
+Пакетный симулятор: много партий сразу в одном массиве NumPy.
+
+Каждая партия - это поле компьютера, по которому стреляет обучаемый агент.
+Все N полей хранятся как один массив (N, размер, размер) из маленьких целых
+чисел, а один вызов step() делает по выстрелу во всех партиях сразу
+без циклов на Python. Интерфейс похож на gym: reset() и step(actions).
+"""
+
+import random
+
+import numpy as np
+
+from engine import (
+    EMPTY,
+    GRID_SIZE,
+    HIT,
+    MISS,
+    calculate_ships_for_grid,
+    default_placement,
+    rejection_fleet,
+)
+from placement import FleetGenerator
+
+
+class BatchBattleship:
+    """
+    N независимых партий "агент стреляет по случайно расставленному флоту"
+
+    Наблюдение (observations) - массив (N, размер, размер) со значениями
+    EMPTY / MISS / HIT: ровно то, что видит стреляющий.
+    Действие - номер клетки y * размер + x для каждой партии.
+    """
+
+    def __init__(
+        self,
+        num_games,
+        grid_size=GRID_SIZE,
+        ships=None,
+        seed=None,
+        auto_reset=True,
+        mark_halo=True,
+    ):
+        """
+        num_games - сколько партий играть одновременно
+        grid_size - размер поля
+        ships - словарь {размер: количество}, по умолчанию считается по размеру поля
+        seed - зерно генераторов случайных чисел
+        auto_reset - сразу начинать новую партию на месте законченной
+        mark_halo - помечать промахами клетки вокруг потопленного корабля
+        (как в обычной игре)
+        """
+        self.num_games = num_games
+        self.grid_size = grid_size
+        if ships is None:
+            ships = calculate_ships_for_grid(grid_size)
+        self.ships = dict(ships)
+        # на больших полях - rejection_fleet, как в движке (см. default_placement)
+        self.fleet_generator = None
+        if default_placement(grid_size) == "generator":
+            self.fleet_generator = FleetGenerator(grid_size, self.ships)
+        self.auto_reset = auto_reset
+        self.mark_halo = mark_halo
+
+        self.random = random.Random(seed)  # для расстановки кораблей
+        self.rng = np.random.default_rng(seed)  # для случайных выстрелов
+
+        num_ships = sum(self.ships.values())
+        # номера кораблей начинаются с 1 (0 - пустая клетка), берем самый
+        # маленький тип, в который влезают все номера
+        id_dtype = np.int8 if num_ships < 127 else np.int16
+
+        shape = (num_games, grid_size, grid_size)
+        self.observations = np.zeros(shape, dtype=np.int8)  # что видно агенту
+        self.ship_ids = np.zeros(shape, dtype=id_dtype)  # номер корабля в клетке
+        # сколько целых клеток осталось у каждого корабля (столбец 0 не используется)
+        self.health = np.zeros((num_games, num_ships + 1), dtype=np.int8)
+        self.ships_left = np.zeros(num_games, dtype=np.int16)
+        self.shots = np.zeros(num_games, dtype=np.int32)  # выстрелов в партии
+        # длина только что законченных партий (заполняется в step)
+        self.finished_shots = np.zeros(num_games, dtype=np.int32)
+
+        self._game_index = np.arange(num_games)
+        self.reset()
+
+    def reset(self, mask=None):
+        """
+        Начинает партии заново
+        mask - булев массив (N,), какие партии сбросить (по умолчанию все)
+        Возвращает наблюдения
+        """
+        if mask is None:
+            games = self._game_index
+        else:
+            games = np.flatnonzero(mask)
+        if len(games) == 0:
+            return self.observations
+
+        self.observations[games] = EMPTY
+        self.ship_ids[games] = 0
+        self.health[games] = 0
+        self.ships_left[games] = len(self.health[0]) - 1
+        self.shots[games] = 0
+
+        # новая расстановка флота для каждой сбрасываемой партии
+        for game in games:
+            ship_ids = self.ship_ids[game]
+            health = self.health[game]
+            if self.fleet_generator is not None:
+                placements = self.fleet_generator.sample(self.random)
+            else:
+                placements = rejection_fleet(self.grid_size, self.ships, self.random)
+            for ship_id, (x, y, size, horizontal) in enumerate(placements, 1):
+                if horizontal:
+                    ship_ids[y, x : x + size] = ship_id
+                else:
+                    ship_ids[y : y + size, x] = ship_id
+                health[ship_id] = size
+        return self.observations
+
+    def step(self, actions):
+        """
+        Делает по одному выстрелу в каждой партии
+        actions - массив (N,) с номерами клеток y * размер + x
+        Возвращает (observations, hit, miss, sunk, done):
+        hit / miss - попали или промахнулись (повторный выстрел в ту же
+        клетку - ни то ни другое, просто потраченный ход),
+        sunk - этим выстрелом потоплен корабль,
+        done - партия закончилась (все корабли потоплены)
+        Без auto_reset законченные партии стоят на месте: выстрелы в них
+        ничего не меняют и не считаются
+        """
+        actions = np.asarray(actions)
+        ys, xs = np.divmod(actions, self.grid_size)
+        games = self._game_index
+
+        running = self.ships_left > 0  # партии, которые еще не закончились
+        # сюда еще не стреляли
+        fresh = running & (self.observations[games, ys, xs] == EMPTY)
+        ship_id = self.ship_ids[games, ys, xs]
+        hit = fresh & (ship_id > 0)
+        miss = fresh & (ship_id == 0)
+
+        # отмечаем результаты выстрелов
+        self.observations[games, ys, xs] = np.where(
+            hit, HIT, np.where(miss, MISS, self.observations[games, ys, xs])
+        )
+        # у подбитых кораблей становится на одну целую клетку меньше
+        self.health[games[hit], ship_id[hit]] -= 1
+        sunk = hit & (self.health[games, ship_id] == 0)
+        self.ships_left -= sunk
+        if self.mark_halo and sunk.any():
+            self._mark_halo(games[sunk], ship_id[sunk])
+        self.shots += running
+        done = self.ships_left == 0
+        finished = running & done  # закончились именно этим выстрелом
+
+        self.finished_shots[:] = 0
+        if finished.any():
+            self.finished_shots[finished] = self.shots[finished]
+            if self.auto_reset:
+                # в законченных партиях сразу начинается новая игра
+                self.reset(done)
+        return self.observations, hit, miss, sunk, done
+
+    def _mark_halo(self, games, ship_ids):
+        """
+        Помечает промахами клетки вокруг потопленных кораблей
+        games - номера партий, ship_ids - номера потопленных в них кораблей
+        """
+        ship = self.ship_ids[games] == ship_ids[:, None, None]  # (k, размер, размер)
+        # "раздуваем" корабль на клетку во все стороны сдвигами массива
+        padded = np.pad(ship, ((0, 0), (1, 1), (1, 1)))
+        size = self.grid_size
+        around = np.zeros_like(ship)
+        for dy in range(3):
+            for dx in range(3):
+                around |= padded[:, dy : dy + size, dx : dx + size]
+        observations = self.observations[games]
+        observations[around & (observations == EMPTY)] = MISS
+        self.observations[games] = observations
+
+    def legal_actions(self):
+        """
+        Булев массив (N, размер * размер): в какие клетки еще не стреляли
+        """
+        return self.observations.reshape(self.num_games, -1) == EMPTY
+
+    def sample_actions(self):
+        """
+        Случайный выстрел в еще не обстрелянную клетку для каждой партии
+        """
+        scores = self.rng.random((self.num_games, self.grid_size * self.grid_size))
+        scores[~self.legal_actions()] = -1.0  # обстрелянные клетки не выбираем
+        return scores.argmax(axis=1)
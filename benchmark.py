@@ -0,0 +1,349 @@
+"""
+Замеры скорости горячих мест игры.
+
+Для каждого размера поля и плотности флота меряется:
+- время отдельных операций (подсчет флота, проверка места под корабль,
+  расстановка кораблей компьютера, ход компьютера, рисование сетки и
+  кораблей, кадр игрового цикла) - с процентилями, а не только среднее
+- сколько партий компьютер против компьютера играется за секунду
+- сколько кадров в секунду рисуется (полная перерисовка и по изменениям)
+
+Окно не открывается: pygame работает с драйвером "dummy".
+Результаты сохраняются в JSON, и с флагом --compare новый замер
+сравнивается со старым (код выхода 1, если что-то стало медленнее).
+
+Пример запуска:
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+"""
+
+import os
+
+# без настоящего окна; задать до импорта pygame
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+import pygame
+
+from engine import (
+    BattleshipEngine,
+    Fleet,
+    calculate_ships_for_grid,
+    can_place_ship,
+    new_field,
+    simulate_game,
+)
+from main import MARGIN, WINDOW_WIDTH, BattleshipGame
+from placement import ImpossibleFleetError
+
+GRID_SIZES = (6, 8, 10, 12)
+FILL_RATIOS = (0.15, 0.25, 0.3)
+
+
+def measure(func, calls, warmup=3):
+    """
+    Вызывает func calls раз и возвращает время каждого вызова в микросекундах
+    """
+    for _ in range(warmup):
+        func()
+    clock = time.perf_counter_ns
+    times = []
+    for _ in range(calls):
+        start = clock()
+        func()
+        times.append((clock() - start) / 1000)
+    return times
+
+
+def latency_stats(times):
+    """
+    Процентили времени вызова (мкс)
+    """
+    times = sorted(times)
+    count = len(times)
+    return {
+        "calls": count,
+        "mean": statistics.fmean(times),
+        "p50": times[count // 2],
+        "p90": times[min(count - 1, int(count * 0.9))],
+        "p99": times[min(count - 1, int(count * 0.99))],
+        "max": times[-1],
+    }
+
+
+def bench_engine(grid_size, fill_ratio, ships, calls):
+    """
+    Операции движка без окна
+    """
+    rng = random.Random(0)
+    ops = {}
+    ops["calculate_ships_for_grid"] = measure(
+        lambda: calculate_ships_for_grid(grid_size, fill_ratio), calls
+    )
+
+    engine = BattleshipEngine(grid_size, ships, seed=0)
+    field = engine.computer_field
+
+    def check_random_place():
+        x = rng.randrange(grid_size)
+        y = rng.randrange(grid_size)
+        can_place_ship(field, x, y, rng.choice(list(ships)), rng.random() < 0.5)
+
+    ops["can_place_ship"] = measure(check_random_place, calls)
+
+    def place_computer_ships():
+        engine.computer_field = new_field(grid_size)
+        engine.computer_fleet = Fleet()
+        engine.place_computer_ships()
+
+    ops["place_computer_ships"] = measure(place_computer_ships, max(1, calls // 10))
+    return {name: latency_stats(times) for name, times in ops.items()}
+
+
+def bench_moves(grid_size, ships, difficulty, games):
+    """
+    Время хода компьютера (choose_shot + выстрел) по нескольким партиям
+    """
+    clock = time.perf_counter_ns
+    times = []
+    for seed in range(games):
+        engine = BattleshipEngine(grid_size, ships, seed=seed, difficulty=difficulty)
+        engine.place_player_ships_randomly()
+        engine.is_player_turn = False
+        while not engine.game_over:
+            engine.is_player_turn = False  # стреляет только компьютер
+            start = clock()
+            engine.computer_move()
+            times.append((clock() - start) / 1000)
+    return latency_stats(times)
+
+
+def bench_games(grid_size, ships, difficulty, seconds):
+    """
+    Сколько партий компьютер против компьютера играется за секунду
+    """
+    games = 0
+    start = time.perf_counter()
+    while True:
+        simulate_game(grid_size, ships, games, difficulty=difficulty)
+        games += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return games / elapsed
+
+
+def bench_rendering(grid_size, ships, calls):
+    """
+    Рисование: сетка, корабли и кадр игрового цикла
+    Кадр "с ходом" - компьютер стреляет и кадр рисуется, кадр "пустой" -
+    ничего не изменилось (так цикл рисует, пока ждет игрока)
+    """
+    ops = {}
+    fps = {}
+    for dirty in (False, True):
+        mode = "dirty" if dirty else "full"
+        # режим большого поля (рисуется только видимая часть) замеряется
+        # не здесь: рисование сравнивается одинаковым способом на всех полях
+        game = BattleshipGame(
+            grid_size,
+            ships,
+            dirty_rendering=dirty,
+            fps=0,
+            computer_delay=0,
+            large_board=False,
+        )
+        game.place_player_ships_randomly()
+
+        if not dirty:
+            ops["draw_grid"] = latency_stats(
+                measure(lambda: game.draw_grid(WINDOW_WIDTH // 2 + MARGIN), calls)
+            )
+            ops["draw_ships"] = latency_stats(measure(game.draw_ships, calls))
+
+        def frame():
+            # то же, что делает один оборот run(), без ожидания событий
+            game.check_game_over()
+            game.draw_frame()
+            pygame.event.pump()
+
+        idle = measure(frame, calls)
+        clock = time.perf_counter_ns
+        moves = []
+        for _ in range(calls):
+            if game.game_over:
+                _restart(game)  # новая партия не входит в замер
+            game.is_player_turn = False
+            start = clock()
+            game.computer_move()
+            frame()
+            moves.append((clock() - start) / 1000)
+        ops[f"frame_idle_{mode}"] = latency_stats(idle)
+        ops[f"frame_move_{mode}"] = latency_stats(moves)
+        fps[f"idle_{mode}"] = 1e6 / statistics.fmean(idle)
+        fps[f"move_{mode}"] = 1e6 / statistics.fmean(moves)
+    return ops, fps
+
+
+def _restart(game):
+    """
+    Новая партия в том же окне (чтобы кадры с ходом не кончались)
+    Окно, рендерер и таблицы расстановок остаются - как между партиями
+    в настоящей игре, а не как при запуске
+    """
+    game.reset_game()
+    game.place_computer_ships()
+    game.place_player_ships_randomly()
+    game.ai  # стратегия создается здесь, а не в первом замеренном ходе
+
+
+def run_benchmarks(grid_sizes, fill_ratios, calls, games, seconds, difficulties):
+    results = {}
+    for grid_size in grid_sizes:
+        for fill_ratio in fill_ratios:
+            key = f"{grid_size}x{grid_size}/{fill_ratio}"
+            ships = calculate_ships_for_grid(grid_size, fill_ratio)
+            try:
+                ops = bench_engine(grid_size, fill_ratio, ships, calls)
+            except ImpossibleFleetError as error:
+                print(f"{key}: пропущено ({error})")
+                continue
+            games_per_sec = {}
+            for difficulty in difficulties:
+                ops[f"computer_move_{difficulty}"] = bench_moves(
+                    grid_size, ships, difficulty, games
+                )
+                games_per_sec[difficulty] = bench_games(
+                    grid_size, ships, difficulty, seconds
+                )
+            render_ops, fps = bench_rendering(grid_size, ships, calls)
+            ops.update(render_ops)
+            results[key] = {
+                "ships": {str(size): count for size, count in ships.items()},
+                "ops": ops,
+                "games_per_sec": games_per_sec,
+                "fps": fps,
+            }
+            print_result(key, results[key])
+    return results
+
+
+def print_result(key, result):
+    print(f"\n== {key} флот {result['ships']}")
+    print(f"{'операция':<32}{'p50':>10}{'p90':>10}{'p99':>10}{'макс':>10}  мкс")
+    for name, stats in result["ops"].items():
+        print(
+            f"{name:<32}{stats['p50']:>10.1f}{stats['p90']:>10.1f}"
+            f"{stats['p99']:>10.1f}{stats['max']:>10.1f}"
+        )
+    games = ", ".join(f"{k} {v:.0f}" for k, v in result["games_per_sec"].items())
+    print(f"партий/с: {games}")
+    fps = ", ".join(f"{k} {v:.0f}" for k, v in result["fps"].items())
+    print(f"кадров/с: {fps}")
+
+
+def metrics(results):
+    """
+    Плоский словарь {название: (значение, больше - лучше)} для сравнения
+    """
+    flat = {}
+    for key, result in results.items():
+        for name, stats in result["ops"].items():
+            flat[f"{key} {name} p50"] = (stats["p50"], False)
+        for name, value in result["games_per_sec"].items():
+            flat[f"{key} games/s {name}"] = (value, True)
+        for name, value in result["fps"].items():
+            flat[f"{key} fps {name}"] = (value, True)
+    return flat
+
+
+def compare(old_results, new_results, threshold):
+    """
+    Печатает изменения относительно старого замера
+    Возвращает список того, что стало медленнее больше чем в threshold раз
+    """
+    old = metrics(old_results)
+    new = metrics(new_results)
+    regressions = []
+    print(f"\n{'метрика':<56}{'было':>12}{'стало':>12}{'x':>8}")
+    for name, (value, higher_is_better) in new.items():
+        if name not in old or old[name][0] == 0 or value == 0:
+            continue
+        before = old[name][0]
+        # во сколько раз стало медленнее (больше 1 - хуже)
+        slowdown = before / value if higher_is_better else value / before
+        mark = ""
+        if slowdown > threshold:
+            mark = "  <-- медленнее"
+            regressions.append(name)
+        print(f"{name:<56}{before:>12.1f}{value:>12.1f}{slowdown:>8.2f}{mark}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры скорости морского боя")
+    parser.add_argument("--grid-sizes", type=int, nargs="+", default=GRID_SIZES)
+    parser.add_argument("--fill-ratios", type=float, nargs="+", default=FILL_RATIOS)
+    parser.add_argument(
+        "--difficulties", nargs="+", default=["random", "smart"], help="стратегии"
+    )
+    parser.add_argument("--calls", type=int, default=1000, help="вызовов на операцию")
+    parser.add_argument("--games", type=int, default=20, help="партий для ходов")
+    parser.add_argument(
+        "--seconds", type=float, default=1.0, help="сколько секунд играть партии"
+    )
+    parser.add_argument("--quick", action="store_true", help="короткий прогон")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--compare", help="JSON старого замера для сравнения")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="во сколько раз можно замедлиться без ошибки",
+    )
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.calls, args.games, args.seconds = 100, 3, 0.2
+
+    results = run_benchmarks(
+        args.grid_sizes,
+        args.fill_ratios,
+        args.calls,
+        args.games,
+        args.seconds,
+        args.difficulties,
+    )
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pygame": pygame.version.ver,
+            "machine": platform.platform(),
+            "calls": args.calls,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=1)
+    print(f"\nРезультаты сохранены в {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            old = json.load(file)
+        regressions = compare(old["results"], results, args.threshold)
+        if regressions:
+            print(f"\nМедленнее, чем было: {len(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Поле "Морского боя" в виде битовых масок.
+
+Каждой клетке соответствует один бит целого числа (бит номер y * размер + x).
+Корабли, промахи и попадания хранятся в трех отдельных масках, поэтому
+"можно ли поставить корабль", "поставить" и "выстрелить" - это несколько
+побитовых операций вместо перебора клеток. Маски всех возможных расстановок
+(вместе с ореолом вокруг корабля, где нельзя ставить другие корабли)
+считаются один раз.
+
+Поле можно выбрать в движке вместо массива NumPy:
+BattleshipEngine(field_type="bitboard"). Результаты игры одинаковые.
+"""
+
+import numpy as np
+
+from engine import EMPTY, HIT, MISS, SHIP
+from tables import cached_table
+
+
+def placement_masks(grid_size, size):
+    """
+    Все расстановки корабля размера size на поле grid_size x grid_size
+    Возвращает словарь {(x, y, horizontal): (маска корабля, маска корабля с ореолом)}
+    Расстановки, вылезающие за поле, в словарь не попадают
+    Маски считаются один раз на поле и размер (см. tables.py)
+    """
+    return cached_table("masks", _build_placement_masks, grid_size, size)
+
+
+def _build_placement_masks(grid_size, size):
+    masks = {}
+    for horizontal in (True, False):
+        width, height = (size, 1) if horizontal else (1, size)
+        for y in range(grid_size - height + 1):
+            for x in range(grid_size - width + 1):
+                ship = rect_mask(grid_size, x, y, width, height)
+                # ореол - на клетку шире корабля во все стороны
+                # (с обрезкой по краю поля)
+                x0, y0 = max(0, x - 1), max(0, y - 1)
+                x1 = min(grid_size, x + width + 1)
+                y1 = min(grid_size, y + height + 1)
+                zone = rect_mask(grid_size, x0, y0, x1 - x0, y1 - y0)
+                masks[(x, y, horizontal)] = (ship, zone)
+    return masks
+
+
+def rect_mask(grid_size, x, y, width, height):
+    """
+    Маска прямоугольника width x height с левым верхним углом в (x, y)
+    """
+    row = ((1 << width) - 1) << x  # одна строка прямоугольника
+    mask = 0
+    for j in range(y, y + height):
+        mask |= row << (j * grid_size)
+    return mask
+
+
+class BitField:
+    """
+    Поле из трех битовых масок: целые корабли, промахи и попадания
+    Поддерживает чтение и запись клеток как массив: field[y, x]
+    """
+
+    def __init__(self, grid_size):
+        self.grid_size = grid_size
+        self.shape = (grid_size, grid_size)
+        self.ships = 0  # клетки с целыми кораблями
+        self.misses = 0  # клетки с промахами
+        self.hits = 0  # клетки с попаданиями
+        self.masks = {}  # размер корабля -> маски расстановок (см. placement_masks)
+
+    def _bit(self, x, y):
+        return 1 << (y * self.grid_size + x)
+
+    def __getitem__(self, cell):
+        y, x = cell
+        bit = self._bit(x, y)
+        if self.ships & bit:
+            return SHIP
+        if self.hits & bit:
+            return HIT
+        if self.misses & bit:
+            return MISS
+        return EMPTY
+
+    def __setitem__(self, cell, value):
+        y, x = cell
+        bit = self._bit(x, y)
+        # клетка может быть только в одной маске
+        self.ships &= ~bit
+        self.misses &= ~bit
+        self.hits &= ~bit
+        if value == SHIP:
+            self.ships |= bit
+        elif value == MISS:
+            self.misses |= bit
+        elif value == HIT:
+            self.hits |= bit
+
+    @property
+    def occupied(self):
+        """
+        Все непустые клетки
+        """
+        return self.ships | self.misses | self.hits
+
+    def can_place_ship(self, x, y, size, horizontal):
+        """
+        Можно ли поставить корабль: он влезает в поле, а ни он сам,
+        ни его ореол не задевают уже занятые клетки
+        """
+        masks = self._masks(size).get((x, y, horizontal))
+        if masks is None:  # корабль вылезает за поле
+            return False
+        return not masks[1] & self.occupied
+
+    def place_ship(self, x, y, size, horizontal):
+        """
+        Ставит корабль (проверку нужно сделать заранее через can_place_ship)
+        """
+        self.ships |= self._masks(size)[(x, y, horizontal)][0]
+
+    def _masks(self, size):
+        # свой словарь быстрее, чем каждый раз спрашивать общий кэш
+        if size not in self.masks:
+            self.masks[size] = placement_masks(self.grid_size, size)
+        return self.masks[size]
+
+    def fire(self, x, y):
+        """
+        Выстрел по клетке: возвращает MISS или HIT, либо None, если сюда уже стреляли
+        """
+        bit = self._bit(x, y)
+        if (self.misses | self.hits) & bit:
+            return None
+        if self.ships & bit:
+            self.ships &= ~bit
+            self.hits |= bit
+            return HIT
+        self.misses |= bit
+        return MISS
+
+    def to_array(self):
+        """
+        То же поле в виде массива NumPy (как у обычного поля движка)
+        """
+        size = self.grid_size
+        array = np.zeros(size * size, dtype=np.int8)
+        for mask, value in ((self.ships, SHIP), (self.misses, MISS), (self.hits, HIT)):
+            bits = np.frombuffer(
+                mask.to_bytes((size * size + 7) // 8, "little"), np.uint8
+            )
+            array[np.unpackbits(bits, bitorder="little")[: size * size] == 1] = value
+        return array.reshape(size, size)
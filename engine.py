@@ -0,0 +1,640 @@
+"""
+Логика игры "Морской бой" без графики.
+
+Здесь нет pygame: только поля, расстановка кораблей, выстрелы и проверка
+конца игры. Поэтому движок можно импортировать где угодно (в тестах,
+симуляторах, при обучении ИИ) и играть тысячи партий без окна.
+"""
+
+import random
+
+import numpy as np
+
+from placement import FleetGenerator
+
+# размер поля по умолчанию (поле x на x клеток)
+GRID_SIZE = 8
+
+# значения для клеток поля
+EMPTY = 0  # пустая клетка
+SHIP = 1  # клетка с кораблем
+MISS = 2  # клетка с промахом
+HIT = 3  # клетка с попаданием
+
+
+def calculate_ships_for_grid(grid_size, fill_ratio=0.25):
+    """
+    Рассчитывает допустимое количество кораблей для заданного размера поля.
+    Размер поля определяет максимальный размер корабля и их количество.
+    Обязательно добавляются однопалубные корабли.
+    fill_ratio - какую долю поля могут занять корабли (плотность флота)
+    """
+    # Определяем максимальный размер корабля в зависимости от размера поля
+    if grid_size <= 6:
+        max_ship_size = 2
+    elif grid_size <= 8:
+        max_ship_size = 3
+    else:
+        max_ship_size = 4
+
+    # Рассчитываем максимальное количество клеток под корабли (обычно 25% поля)
+    total_cells = grid_size * grid_size
+    max_ship_cells = int(total_cells * fill_ratio)
+
+    ships = {}
+    current_cells = 0
+
+    # Распределяем корабли по размерам
+    for size in range(max_ship_size, 0, -1):
+        # Количество кораблей зависит от их размера и размера поля
+        if size == 4:
+            count = 1
+        elif size == 3:
+            count = grid_size // 3
+        elif size == 2:
+            count = grid_size // 2
+        else:  # для однопалубных
+            count = grid_size // 2 + 1
+
+        # Проверяем, не превысим ли лимит клеток
+        new_cells = size * count
+        if current_cells + new_cells <= max_ship_cells:
+            ships[size] = count
+            current_cells += new_cells
+        else:
+            # Если превышаем, берем меньшее количество
+            remaining_cells = max_ship_cells - current_cells
+            possible_count = remaining_cells // size
+            if possible_count > 0:
+                ships[size] = possible_count
+                current_cells += possible_count * size
+
+    # Убеждаемся, что есть хотя бы один однопалубный корабль
+    if 1 not in ships:
+        ships[1] = 1
+
+    return ships
+
+
+# виды полей: массив NumPy, битовые маски (bitboard.py)
+# или словарь непустых клеток для очень больших полей (sparse.py)
+FIELD_TYPES = ("array", "bitboard", "sparse")
+
+# битовые маски всех расстановок (bitboard.py) занимают площадь поля в квадрате
+# бит: на поле 200x200 это уже почти 2 ГБ, поэтому больше - только другие поля
+MAX_BITBOARD_GRID = 128
+
+# способы случайной расстановки флота: FleetGenerator или старый rejection_fleet
+PLACEMENTS = ("generator", "rejection")
+
+# на полях больше этого FleetGenerator по умолчанию не используется: его
+# таблица всех расстановок (placement.py) растет с площадью поля - на поле
+# 400x400 это уже больше гигабайта памяти и секунды на построение
+MAX_GENERATOR_GRID = 100
+
+
+def default_placement(grid_size, field_type="array"):
+    """
+    Способ расстановки по умолчанию (см. PLACEMENTS): FleetGenerator,
+    а на больших полях и на разреженных полях - rejection_fleet
+    """
+    if field_type == "sparse" or grid_size > MAX_GENERATOR_GRID:
+        return "rejection"
+    return "generator"
+
+
+def new_field(grid_size, field_type="array"):
+    """
+    Создает пустое поле grid_size x grid_size
+    field_type - "array" (массив NumPy), "bitboard" (битовые маски)
+    или "sparse" (только непустые клетки)
+    (в массиве int8 вместо float64: значения клеток маленькие, а памяти нужно
+    в 8 раз меньше)
+    """
+    if field_type == "bitboard":
+        if grid_size > MAX_BITBOARD_GRID:
+            raise ValueError(
+                f"Поле {grid_size}x{grid_size} слишком большое для битовых масок "
+                f"(не больше {MAX_BITBOARD_GRID}), возьмите field_type='sparse'"
+            )
+        from bitboard import BitField  # bitboard.py сам импортирует engine.py
+
+        return BitField(grid_size)
+    if field_type == "sparse":
+        from sparse import SparseField  # sparse.py сам импортирует engine.py
+
+        return SparseField(grid_size)
+    if field_type != "array":
+        raise ValueError(f"Неизвестный вид поля: {field_type}")
+    return np.zeros((grid_size, grid_size), dtype=np.int8)
+
+
+def can_place_ship(field, x, y, size, horizontal):
+    """
+    Проверяет, можно ли поставить корабль в указанное место
+    field - поле, на котором ставим
+    x, y - координаты начала корабля
+    size - размер корабля
+    horizontal - как ставим (горизонтально или вертикально)
+    """
+    if not isinstance(field, np.ndarray):  # другие виды полей проверяют сами
+        return field.can_place_ship(x, y, size, horizontal)
+    grid_size = field.shape[0]
+    if horizontal:  # если ставим горизонтально
+        if x + size > grid_size:  # проверяем, не вылезет ли корабль за поле вправо
+            return False
+        x_end, y_end = x + size, y + 1
+    else:  # если ставим вертикально
+        if y + size > grid_size:  # проверяем, не вылезет ли корабль за поле вниз
+            return False
+        x_end, y_end = x + 1, y + size
+    # проверяем клетки вокруг корабля (корабли не должны касаться друг друга)
+    # одним срезом вместо перебора клеток по одной
+    around = field[
+        max(0, y - 1) : min(grid_size, y_end + 1),
+        max(0, x - 1) : min(grid_size, x_end + 1),
+    ]
+    return not around.any()
+
+
+def place_ship(field, x, y, size, horizontal):
+    """
+    Ставит корабль на поле (параметры такие же, как у can_place_ship)
+    """
+    if not isinstance(field, np.ndarray):  # другие виды полей ставят сами
+        field.place_ship(x, y, size, horizontal)
+        return
+    if horizontal:  # если горизонтально
+        field[y, x : x + size] = SHIP  # заполняем клетки по горизонтали
+    else:  # если вертикально
+        field[y : y + size, x] = SHIP  # заполняем клетки по вертикали
+
+
+def fire(field, x, y):
+    """
+    Выстрел по клетке поля: пустая становится промахом, корабль - попаданием
+    Возвращает MISS или HIT, либо None, если сюда уже стреляли
+    """
+    if not isinstance(field, np.ndarray):  # другие виды полей стреляют сами
+        return field.fire(x, y)
+    value = field[y, x]
+    if value == EMPTY:
+        field[y, x] = MISS
+        return MISS
+    if value == SHIP:
+        field[y, x] = HIT
+        return HIT
+    return None
+
+
+def rejection_fleet(grid_size, ships, rng, field_type="array"):
+    """
+    Старый способ случайной расстановки: ставим корабль в случайную клетку,
+    пока не получится (быстрее и точнее расставляет FleetGenerator из placement.py)
+    rng - генератор случайных чисел (random.Random)
+    field_type - на каком виде поля проверять расстановку (результат не меняется)
+    Возвращает список расстановок (x, y, размер, горизонтально)
+    Если очередной корабль долго не удается поставить (ранние корабли
+    заняли все место), расстановка начинается заново
+    """
+    max_attempts = 20 * grid_size * grid_size
+    while True:
+        field = new_field(grid_size, field_type)
+        placements = _try_random_fleet(field, ships, rng, max_attempts)
+        if placements is not None:
+            return placements
+        # не получилось - начинаем сначала на чистом поле
+
+
+def _try_random_fleet(field, ships, rng, max_attempts):
+    """
+    Одна попытка расставить флот, None - если какой-то корабль не влез
+    """
+    grid_size = field.shape[0]
+    placements = []
+    # перебираем все корабли
+    for ship_size, count in ships.items():
+        # для каждого размера корабля расставляем нужное количество
+        for _ in range(count):
+            for _ in range(max_attempts):  # пытаемся поставить корабль
+                # выбираем случайные координаты и ориентацию
+                x = rng.randint(0, grid_size - 1)
+                y = rng.randint(0, grid_size - 1)
+                horizontal = rng.choice([True, False])
+
+                # проверяем, можно ли поставить корабль
+                if can_place_ship(field, x, y, ship_size, horizontal):
+                    # если можно - ставим и переходим к следующему кораблю
+                    place_ship(field, x, y, ship_size, horizontal)
+                    placements.append((x, y, ship_size, horizontal))
+                    break
+            else:  # корабль так и не удалось поставить
+                return None
+    return placements
+
+
+class Ship:
+    """
+    Один корабль на поле: номер, клетки и сколько целых клеток осталось
+    """
+
+    def __init__(self, ship_id, x, y, size, horizontal):
+        self.ship_id = ship_id
+        self.x = x
+        self.y = y
+        self.size = size
+        self.horizontal = horizontal
+        if horizontal:
+            self.cells = [(x + i, y) for i in range(size)]
+        else:
+            self.cells = [(x, y + i) for i in range(size)]
+        self.health = size  # целые клетки
+
+    @property
+    def sunk(self):
+        return self.health == 0
+
+    def halo(self, grid_size):
+        """
+        Клетки вокруг корабля (в них не может быть других кораблей)
+        """
+        x_end, y_end = self.cells[-1]
+        return [
+            (i, j)
+            for j in range(max(0, self.y - 1), min(grid_size, y_end + 2))
+            for i in range(max(0, self.x - 1), min(grid_size, x_end + 2))
+            if not (self.x <= i <= x_end and self.y <= j <= y_end)
+        ]
+
+
+class Fleet:
+    """
+    Реестр кораблей одного поля: какой корабль стоит в клетке
+    и сколько кораблей еще не потоплено
+    """
+
+    def __init__(self):
+        self.ships = []  # корабли по номерам
+        self.ship_at = {}  # (x, y) -> корабль в этой клетке
+        self.ships_left = 0  # сколько кораблей еще не потоплено
+
+    def add(self, x, y, size, horizontal):
+        """
+        Записывает новый корабль и возвращает его
+        """
+        ship = Ship(len(self.ships), x, y, size, horizontal)
+        self.ships.append(ship)
+        for cell in ship.cells:
+            self.ship_at[cell] = ship
+        self.ships_left += 1
+        return ship
+
+    def hit(self, x, y):
+        """
+        Отмечает попадание в клетку с кораблем
+        Возвращает корабль, если этим выстрелом он потоплен, иначе None
+        """
+        ship = self.ship_at[(x, y)]
+        ship.health -= 1
+        if ship.health == 0:
+            self.ships_left -= 1
+            return ship
+        return None
+
+
+class BattleshipEngine:
+    """
+    Состояние одной партии: поля, корабли, чей ход и счетчики попаданий.
+    Ничего не рисует - этим занимается BattleshipGame в main.py.
+    """
+
+    def __init__(
+        self,
+        grid_size=GRID_SIZE,
+        ships=None,
+        seed=None,
+        field_type="array",
+        difficulty="random",
+        placement=None,
+        ai_options=None,
+        place_ships=True,
+    ):
+        """
+        grid_size - размер поля
+        ships - словарь {размер: количество}, по умолчанию считается по размеру поля
+        seed - зерно генератора случайных чисел (чтобы партии можно было повторить)
+        field_type - как хранить поля: "array" (NumPy), "bitboard" (битовые маски)
+        или "sparse" (только непустые клетки, для очень больших полей)
+        difficulty - уровень сложности компьютера (см. DIFFICULTIES в ai.py)
+        placement - как компьютер расставляет корабли (см. PLACEMENTS),
+        по умолчанию - см. default_placement
+        ai_options - настройки стратегии компьютера (см. make_ai)
+        place_ships - сразу расставить корабли компьютера и создать его
+        стратегию; False - расстановки придут через start_with_fleets
+        (сервер network.py, воспроизведение записей)
+        """
+        self.grid_size = grid_size
+        if ships is None:
+            ships = calculate_ships_for_grid(grid_size)
+        self.ships = dict(ships)
+        self.random = random.Random(seed)
+        self.field_type = field_type
+        if placement is None:
+            placement = default_placement(grid_size, field_type)
+        self.placement = placement
+        self._fleet_generator = None
+        if placement == "generator" and place_ships:
+            # генератор расстановок сразу проверяет, что флот вообще влезает в поле
+            self._fleet_generator = FleetGenerator(grid_size, self.ships)
+        self.total_ship_cells = sum(size * count for size, count in self.ships.items())
+
+        # Стратегия стрельбы компьютера (создается, только когда понадобилась)
+        self.difficulty = difficulty
+        self.ai_options = ai_options or {}
+        self._ai = None
+
+        self.reset_game()
+        if place_ships:
+            # Размещаем корабли компьютера
+            self.place_computer_ships()
+            self._ai = self.ai  # компьютер готов стрелять с первого хода
+
+    def reset_game(self):
+        """
+        Все, что относится к одной партии, - как перед расстановкой кораблей:
+        пустые поля, никто не стрелял, стратегия компьютера ничего не знает
+        """
+        # Создаем игровые поля
+        self.player_field = new_field(self.grid_size, self.field_type)
+        self.computer_field = new_field(self.grid_size, self.field_type)
+        self.computer_visible_field = new_field(self.grid_size, self.field_type)
+
+        # Реестры кораблей: по ним сразу видно, потоплен ли корабль
+        self.player_fleet = Fleet()
+        self.computer_fleet = Fleet()
+        self.last_sunk = None  # корабль, потопленный последним выстрелом
+
+        self.ships_to_place = self.ships.copy()
+        # Начинаем расстановку с самого большого корабля
+        self.current_ship_size = max(self.ships.keys())
+
+        self.is_game_started = False
+        self.is_player_turn = True
+        self.game_over = False
+
+        # Счетчики попаданий
+        self.player_hits = 0
+        self.computer_hits = 0
+        # все выстрелы партии по порядку: (x, y, MISS или HIT); кто стрелял,
+        # видно по правилам (после промаха ход переходит, первым ходит игрок)
+        self.shot_log = []
+
+        self._ai = None  # новая стратегия - без наблюдений прошлой партии
+
+    @property
+    def ai(self):
+        """
+        Стратегия стрельбы компьютера (см. make_ai)
+        """
+        if self._ai is None:
+            from ai import make_ai  # ai.py сам импортирует engine.py
+
+            self._ai = make_ai(
+                self.difficulty,
+                self.grid_size,
+                self.ships,
+                self.random,
+                **self.ai_options,
+            )
+        return self._ai
+
+    @property
+    def fleet_generator(self):
+        """
+        Генератор расстановок (создается, только когда понадобился)
+        """
+        if self._fleet_generator is None:
+            self._fleet_generator = FleetGenerator(self.grid_size, self.ships)
+        return self._fleet_generator
+
+    def place_computer_ships(self):
+        """
+        Компьютер расставляет свои корабли случайным образом
+        """
+        self.place_random_ships(self.computer_field, self.placement)
+
+    def place_random_ships(self, field, placement=None):
+        """
+        Расставляет на поле весь флот случайным образом
+        placement - способ расстановки (см. PLACEMENTS), по умолчанию тот же,
+        что у компьютера
+        Возвращает список расстановок (x, y, размер, горизонтально)
+        """
+        placement = placement or self.placement
+        if placement == "generator":
+            placements = self.fleet_generator.sample(self.random)
+        elif placement == "rejection":
+            placements = rejection_fleet(
+                self.grid_size, self.ships, self.random, self.field_type
+            )
+        else:
+            raise ValueError(f"Неизвестный способ расстановки: {placement}")
+        for x, y, size, horizontal in placements:
+            self.place_ship(field, x, y, size, horizontal)
+        return placements
+
+    def can_place_ship(self, field, x, y, size, horizontal):
+        """
+        Проверяет, можно ли поставить корабль в указанное место
+        field - поле, на котором ставим
+        x, y - координаты начала корабля
+        size - размер корабля
+        horizontal - как ставим (горизонтально или вертикально)
+        """
+        return can_place_ship(field, x, y, size, horizontal)
+
+    def place_ship(self, field, x, y, size, horizontal):
+        """
+        Ставит корабль на поле
+        field - поле, на котором ставим
+        x, y - координаты начала корабля
+        size - размер корабля
+        horizontal - как ставим (горизонтально или вертикально)
+        Возвращает записанный в реестр корабль
+        """
+        place_ship(field, x, y, size, horizontal)
+        fleet = self.player_fleet if field is self.player_field else self.computer_fleet
+        return fleet.add(x, y, size, horizontal)
+
+    def place_player_ship(self, x, y, horizontal):
+        """
+        Ставит очередной корабль игрока (текущего размера)
+        Возвращает True, если корабль удалось поставить
+        """
+        size = self.current_ship_size
+        if self.is_game_started or self.ships_to_place[size] <= 0:
+            return False
+        if not self.can_place_ship(self.player_field, x, y, size, horizontal):
+            return False
+
+        self.place_ship(self.player_field, x, y, size, horizontal)
+        # уменьшаем количество кораблей этого размера
+        self.ships_to_place[size] -= 1
+
+        # если корабли этого размера закончились
+        if self.ships_to_place[size] == 0:
+            # ищем следующий размер корабля (от большего к меньшему)
+            for next_size in sorted(self.ships_to_place, reverse=True):
+                if self.ships_to_place[next_size] > 0:
+                    self.current_ship_size = next_size
+                    break
+            else:  # если все корабли расставлены
+                self.is_game_started = True  # начинаем игру
+        return True
+
+    def place_player_ships_randomly(self, placement=None):
+        """
+        Расставляет корабли игрока случайно и сразу начинает игру
+        (нужно для симуляций, где за игрока тоже играет компьютер)
+        placement - способ расстановки (см. PLACEMENTS)
+        Если корабли игрока уже стоят, поле игрока расставляется заново
+        """
+        if self.player_fleet.ships or self.is_game_started:
+            # второй флот поверх первого - это уже не та игра
+            self.player_field = new_field(self.grid_size, self.field_type)
+            self.player_fleet = Fleet()
+        self.place_random_ships(self.player_field, placement)
+        for size in self.ships_to_place:
+            self.ships_to_place[size] = 0
+        self.is_game_started = True
+
+    def start_with_fleets(self, player_placements, computer_placements):
+        """
+        Ставит заранее известные расстановки вместо случайных и начинает игру
+        (для воспроизведения записанных партий и игры по сети)
+        player_placements, computer_placements - списки (x, y, размер, горизонтально)
+        Все, что было в прошлой партии (выстрелы, счетчики, конец игры),
+        сбрасывается
+        """
+        self.reset_game()
+        for placement in player_placements:
+            self.place_ship(self.player_field, *placement)
+        for placement in computer_placements:
+            self.place_ship(self.computer_field, *placement)
+        for size in self.ships_to_place:
+            self.ships_to_place[size] = 0
+        self.is_game_started = True
+
+    def player_shot(self, x, y):
+        """
+        Выстрел игрока по полю компьютера
+        Возвращает MISS или HIT, либо None, если стрелять сюда нельзя
+        """
+        if not self.is_game_started or self.game_over or not self.is_player_turn:
+            return None
+        # если в эту клетку уже стреляли
+        if self.computer_visible_field[y, x] != EMPTY:
+            return None
+
+        self.last_sunk = None
+        if self.computer_field[y, x] == EMPTY:
+            self.computer_visible_field[y, x] = MISS  # промах
+            self.is_player_turn = False  # передаем ход компьютеру
+            self.shot_log.append((x, y, MISS))
+            return MISS
+
+        self.computer_visible_field[y, x] = HIT  # попадание
+        self.shot_log.append((x, y, HIT))
+        self.player_hits += 1  # увеличиваем счетчик попаданий
+        self._register_hit(self.computer_fleet, self.computer_visible_field, x, y)
+        return HIT
+
+    def computer_move(self):
+        """
+        Ход компьютера: стратегия выбирает клетку, движок стреляет
+        Возвращает координаты выстрела и результат
+        """
+        x, y = self.ai.choose_shot()
+        return x, y, self.computer_shot(x, y)
+
+    def computer_shot(self, x, y):
+        """
+        Выстрел компьютера по полю игрока
+        Возвращает MISS или HIT, либо None, если стрелять сюда нельзя
+        """
+        if not self.is_game_started or self.game_over or self.is_player_turn:
+            return None
+        # поле само отмечает промах или попадание (битовое - одной операцией)
+        result = fire(self.player_field, x, y)
+        if result is None:  # в эту клетку уже стреляли
+            return None
+
+        self.last_sunk = None
+        if result == MISS:
+            self.is_player_turn = True  # передаем ход игроку
+        else:
+            self.computer_hits += 1  # увеличиваем счетчик попаданий
+            self._register_hit(self.player_fleet, self.player_field, x, y)
+        self.shot_log.append((x, y, result))
+        # сообщаем стратегии результат (и потоплен ли корабль)
+        self.ai.observe(x, y, result, self.last_sunk)
+        return result
+
+    def _register_hit(self, fleet, visible_field, x, y):
+        """
+        Отмечает попадание в реестре кораблей; если корабль потоплен,
+        клетки вокруг него сразу помечаются промахами (там точно пусто)
+        """
+        ship = fleet.hit(x, y)
+        self.last_sunk = ship
+        if ship is not None:
+            for i, j in ship.halo(self.grid_size):
+                if visible_field[j, i] == EMPTY:
+                    visible_field[j, i] = MISS
+            self.check_game_over()
+
+    def check_game_over(self):
+        """
+        Проверяет, не закончилась ли игра
+        Возвращает сообщение о победителе или None, если игра продолжается
+        """
+        if not self.is_game_started:
+            return None
+        # если все корабли компьютера потоплены
+        if self.computer_fleet.ships_left == 0:
+            self.game_over = True
+            return "Вы победили!"
+        # если все корабли игрока потоплены
+        elif self.player_fleet.ships_left == 0:
+            self.game_over = True
+            return "Компьютер победил!"
+        return None  # игра продолжается
+
+
+def simulate_game(
+    grid_size=GRID_SIZE,
+    ships=None,
+    seed=None,
+    field_type="array",
+    difficulty="random",
+    player_difficulty="random",
+):
+    """
+    Играет одну партию компьютер против компьютера без окна
+    difficulty - стратегия компьютера, player_difficulty - стратегия за игрока
+    Возвращает движок с итоговым состоянием партии
+    """
+    from ai import make_ai
+
+    engine = BattleshipEngine(grid_size, ships, seed, field_type, difficulty)
+    engine.place_player_ships_randomly()
+    player_ai = make_ai(player_difficulty, grid_size, engine.ships, engine.random)
+
+    while not engine.game_over:
+        if engine.is_player_turn:
+            x, y = player_ai.choose_shot()
+            result = engine.player_shot(x, y)
+            player_ai.observe(x, y, result, engine.last_sunk)
+        else:
+            engine.computer_move()
+    return engine
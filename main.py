@@ -1,14 +1,37 @@
-import pygame
-import numpy as np
-import random
-import sys
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# запускаем pygame
-pygame.init()
+# без приветствия pygame в консоли
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
 
+import pygame
 
-# настройки игрового поля
-GRID_SIZE = 8  # поле x на x клеток
+from engine import (
+    EMPTY,
+    GRID_SIZE,
+    HIT,
+    MISS,
+    SHIP,
+    BattleshipEngine,
+    calculate_ships_for_grid,
+)
+from profiler import FrameProfiler, ProfilerOverlay
+from record import GameRecorder
+from renderer import (
+    BLACK,
+    BLUE,
+    GRAY,
+    RED,
+    WHITE,
+    DirtyRenderer,
+    TextCache,
+    Viewport,
+    ViewportRenderer,
+)
+
+# настройки игрового поля (размер поля GRID_SIZE задается в engine.py)
 CELL_SIZE = 40  # размер одной клетки
 MARGIN = 60  # отступ от края окна
 
@@ -16,107 +39,170 @@ MARGIN = 60  # отступ от края окна
 WINDOW_HEIGHT = 800  # высота окна
 WINDOW_WIDTH = 1000  # ширина окна
 
+# поля больше этого не влезают в окно клетками CELL_SIZE - для них
+# включается режим большого поля: видна только часть поля, ее можно
+# листать стрелками и приближать колесом мыши
+MAX_FIXED_GRID = (WINDOW_WIDTH // 2 - MARGIN) // CELL_SIZE
+BOARD_PIXELS = WINDOW_WIDTH // 2 - 2 * MARGIN  # сторона видимой части поля
+SCROLL_KEYS = {
+    pygame.K_LEFT: (-1, 0),
+    pygame.K_RIGHT: (1, 0),
+    pygame.K_UP: (0, -1),
+    pygame.K_DOWN: (0, 1),
+}
+
+FPS = 60  # не больше стольких кадров в секунду
+COMPUTER_DELAY = 500  # пауза перед выстрелом компьютера (мс), чтобы успеть увидеть ход
+
+# событие "компьютеру пора стрелять" (приходит по таймеру)
+COMPUTER_MOVE_EVENT = pygame.USEREVENT + 1
+# событие "пришло сообщение от сервера" (игра по сети, network.py)
+NETWORK_EVENT = pygame.USEREVENT + 2
+
+# отладка: F3 - показать/скрыть замеры кадра, F4 - сохранить их в файл
+OVERLAY_KEY = pygame.K_F3
+DUMP_KEY = pygame.K_F4
+OVERLAY_REFRESH = 250  # как часто обновлять табличку замеров (мс)
+
+# цвета задаются в renderer.py
+
 
-def calculate_ships_for_grid(grid_size):
+class BattleshipGame(BattleshipEngine):
     """
-    Рассчитывает допустимое количество кораблей для заданного размера поля.
-    Размер поля определяет максимальный размер корабля и их количество.
-    Обязательно добавляются однопалубные корабли.
+    Окно игры: рисует поля и передает клики мышкой в движок (engine.py)
     """
-    # Определяем максимальный размер корабля в зависимости от размера поля
-    if grid_size <= 6:
-        max_ship_size = 2
-    elif grid_size <= 8:
-        max_ship_size = 3
-    else:
-        max_ship_size = 4
-
-    # Рассчитываем максимальное количество клеток под корабли (примерно 25% поля)
-    total_cells = grid_size * grid_size
-    max_ship_cells = int(total_cells * 0.25)
-
-    ships = {}
-    current_cells = 0
-
-    # Распределяем корабли по размерам
-    for size in range(max_ship_size, 0, -1):
-        # Количество кораблей зависит от их размера и размера поля
-        if size == 4:
-            count = 1
-        elif size == 3:
-            count = grid_size // 3
-        elif size == 2:
-            count = grid_size // 2
-        else:  # для однопалубных
-            count = grid_size // 2 + 1
-
-        # Проверяем, не превысим ли лимит клеток
-        new_cells = size * count
-        if current_cells + new_cells <= max_ship_cells:
-            ships[size] = count
-            current_cells += new_cells
-        else:
-            # Если превышаем, берем меньшее количество
-            remaining_cells = max_ship_cells - current_cells
-            possible_count = remaining_cells // size
-            if possible_count > 0:
-                ships[size] = possible_count
-                current_cells += possible_count * size
-
-    # Убеждаемся, что есть хотя бы один однопалубный корабль
-    if 1 not in ships:
-        ships[1] = 1
-
-    return ships
-
-
-# автоматически рассчитываем корабли для заданного размера поля
-SHIPS = calculate_ships_for_grid(GRID_SIZE)
-print(f"Размер поля: {GRID_SIZE}x{GRID_SIZE}")
-print(f"Расстановка кораблей: {SHIPS}")
-
-# задаем разные цвета, которые будем использовать
-WHITE = (255, 255, 255)  # белый для фона
-BLACK = (0, 0, 0)  # черный для сетки
-GRAY = (128, 128, 128)  # серый для промахов
-RED = (255, 0, 0)  # красный для попаданий
-BLUE = (0, 0, 255)  # синий для кораблей
-GREEN = (0, 255, 0)  # зеленый пока не используется, может пригодится
-
-# значения для клеток поля
-EMPTY = 0  # пустая клетка
-SHIP = 1  # клетка с кораблем
-MISS = 2  # клетка с промахом
-HIT = 3  # клетка с попаданием
-
-
-class BattleshipGame:
-    def __init__(self):
+
+    def __init__(
+        self,
+        grid_size=GRID_SIZE,
+        ships=None,
+        difficulty="random",
+        dirty_rendering=True,
+        fps=FPS,
+        computer_delay=COMPUTER_DELAY,
+        profile=False,
+        profile_path="profile.jsonl",
+        large_board=None,
+        record_path=None,
+        server=None,
+        board_labels=None,
+    ):
+        """
+        difficulty - уровень сложности компьютера: "random" или "smart"
+        dirty_rendering - перерисовывать только изменившиеся клетки (renderer.py),
+        иначе каждый кадр рисуется заново целиком
+        fps - ограничение кадров в секунду
+        computer_delay - пауза перед каждым выстрелом компьютера в мс (можно 0)
+        profile - сразу замерять время частей кадра (иначе только пока
+        открыта табличка замеров по F3)
+        profile_path - куда сохранять замеры по F4
+        large_board - режим большого поля: поля хранят только непустые клетки,
+        рисуется только видимая часть, а корабли игрока расставляются сами
+        (по умолчанию включается, если поле не влезает в окно)
+        На очень больших полях корабли расставляются без таблицы всех
+        расстановок (см. default_placement в engine.py), но стратегии
+        smart и montecarlo строят такие таблицы для себя: память и время
+        растут с площадью поля (на 400x400 - больше гигабайта и секунды
+        до первого выстрела), так что там лучше играть против random
+        record_path - файл, в который дописывается сыгранная партия (record.py)
+        server - (хост, порт) сервера network.py: играть по сети с человеком
+        вместо компьютера
+        board_labels - подписи левого и правого поля (по умолчанию
+        "Ваше поле" и поле компьютера или соперника)
+        """
+        if large_board is None:
+            large_board = grid_size > MAX_FIXED_GRID
+        # вся логика игры (поля, корабли, счетчики) живет в движке
+        super().__init__(
+            grid_size,
+            ships,
+            difficulty=difficulty,
+            field_type="sparse" if large_board else "array",
+        )
+
+        # запускаем только то, что нужно окну (без звука, джойстиков и т.п.)
+        pygame.display.init()
+        pygame.font.init()
         self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
         pygame.display.set_caption("Морской бой")
         self.font = pygame.font.Font(None, 36)
+        self.text_cache = TextCache(self.font)  # готовые картинки надписей
         self.horizontal = True
 
-        # Создаем игровые поля
-        self.player_field = np.zeros((GRID_SIZE, GRID_SIZE))
-        self.computer_field = np.zeros((GRID_SIZE, GRID_SIZE))
-        self.computer_visible_field = np.zeros((GRID_SIZE, GRID_SIZE))
-
-        self.ships_to_place = SHIPS.copy()
-        # Находим максимальный размер корабля в автоматически созданном словаре
-        self.current_ship_size = max(SHIPS.keys())
-
-        self.is_game_started = False
-        self.is_player_turn = True
-        self.game_over = False
-
-        # Счетчики попаданий
-        self.player_hits = 0
-        self.computer_hits = 0
-        self.total_ship_cells = sum(size * count for size, count in SHIPS.items())
-
-        # Размещаем корабли компьютера
-        self.place_computer_ships()
+        self.fps = fps
+        self.computer_delay = computer_delay
+        self.computer_move_scheduled = False  # таймер хода компьютера запущен
+        self.pending_shot = None  # компьютер думает над выстрелом (Future)
+
+        # замеры времени кадра (profiler.py)
+        self.profile = profile
+        self.profile_path = profile_path
+        self.profiler = FrameProfiler(enabled=profile)
+        self.overlay = ProfilerOverlay(self.profiler)
+
+        # запись партии в файл, когда она закончится
+        self.recorder = GameRecorder(record_path) if record_path else None
+        self.recorded = False
+
+        # игра по сети: соперник - другой игрок, а не компьютер
+        self.network = None
+        self.network_status = None  # что происходит с соединением
+        self.network_won = None  # итог партии от сервера
+        self.fleet_sent = False
+        self.shot_sent = False  # ждем от сервера результат своего выстрела
+        self.player_label = "Ваше поле"
+        self.opponent_label = "Поле компьютера"
+        if server is not None:
+            from network import NetworkOpponent
+
+            host, port = server
+            self.network = NetworkOpponent(host, port, grid_size, NETWORK_EVENT)
+            self.network_status = "Ждем соперника..."
+            self.is_player_turn = False  # кто ходит первым, скажет сервер
+            self.opponent_label = "Поле соперника"
+        if board_labels is not None:
+            self.player_label, self.opponent_label = board_labels
+
+        # сообщения о состоянии пересобираются, только когда состояние меняется
+        self.status_key = None
+        self.status_cache = []
+
+        self.viewport = None
+        self.renderer = None
+        if large_board:
+            self.viewport = Viewport(grid_size, BOARD_PIXELS, CELL_SIZE)
+            self.renderer = ViewportRenderer(
+                self.screen,
+                self.text_cache,
+                self.viewport,
+                boards=[(MARGIN, MARGIN), (WINDOW_WIDTH // 2 + MARGIN, MARGIN)],
+                labels=[
+                    (self.player_label, (MARGIN, MARGIN - 30)),
+                    (self.opponent_label, (WINDOW_WIDTH // 2 + MARGIN, MARGIN - 30)),
+                    (
+                        "Стрелки - листать поля, колесо мыши или +/- - масштаб",
+                        (MARGIN, MARGIN + BOARD_PIXELS + 40),
+                    ),
+                ],
+                status_center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT - 100),
+            )
+            # расставлять сотни кораблей мышкой никто не будет
+            self.place_player_ships_randomly()
+            pygame.display.flip()
+        elif dirty_rendering:
+            self.renderer = DirtyRenderer(
+                self.screen,
+                self.text_cache,
+                grid_size,
+                CELL_SIZE,
+                boards=[(MARGIN, MARGIN), (WINDOW_WIDTH // 2 + MARGIN, MARGIN)],
+                labels=[
+                    (self.player_label, (MARGIN, MARGIN - 30)),
+                    (self.opponent_label, (WINDOW_WIDTH // 2 + MARGIN, MARGIN - 30)),
+                ],
+                status_center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT - 100),
+            )
+            pygame.display.flip()  # показываем фон с сетками
 
     def display_message(self, message, y_offset=0):
         """
@@ -124,7 +210,7 @@ class BattleshipGame:
         message - само сообщение
         y_offset - сдвиг сообщения вверх или вниз (если нужно несколько сообщений)
         """
-        text = self.font.render(message, True, BLACK)  # создаем текст
+        text = self.text_cache.render(message, BLACK)  # берем готовый текст
         # размещаем текст по центру внизу экрана (можно сдвинуть по y при помощи y_offset)
         text_rect = text.get_rect(
             center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT - 100 + y_offset)
@@ -138,16 +224,57 @@ class BattleshipGame:
         - информацию о ходе игры
         - количество попаданий
         """
+        for message, y_offset in self.status_messages():
+            self.display_message(message, y_offset)
+
+        # подписываем поля игрока и компьютера
+        player_field_text = self.text_cache.render(self.player_label, BLACK)
+        computer_field_text = self.text_cache.render(self.opponent_label, BLACK)
+
+        # размещаем подписи над полями
+        self.screen.blit(player_field_text, (MARGIN, MARGIN - 30))
+        self.screen.blit(computer_field_text, (WINDOW_WIDTH // 2 + MARGIN, MARGIN - 30))
+
+    def status_messages(self):
+        """
+        Сообщения о состоянии игры: список (текст, сдвиг по y)
+        Строки пересобираются, только если изменилось что-то из того,
+        что в них выводится (счетчики, чей ход, оставшиеся корабли...)
+        """
+        key = (
+            self.game_over,
+            self.is_game_started,
+            self.is_player_turn,
+            self.horizontal,
+            self.current_ship_size,
+            tuple(self.ships_to_place.values()),
+            self.player_hits,
+            self.computer_hits,
+            self.network_status,
+            self.network_won,
+        )
+        if key != self.status_key:
+            self.status_key = key
+            self.status_cache = self.build_status_messages()
+        return self.status_cache
+
+    def build_status_messages(self):
+        """
+        Собирает сообщения о состоянии игры заново
+        """
+        messages = []
         if self.game_over:  # если игра закончена
             # показываем результат игры
-            result = (
-                "Вы победили!"
-                if self.player_hits == self.total_ship_cells
-                else "Компьютер победил!"
-            )
-            self.display_message(result, -60)
+            if self.network is None:
+                won = self.computer_fleet.ships_left == 0
+                result = "Вы победили!" if won else "Компьютер победил!"
+            elif self.network_won is None:  # соединение оборвалось
+                result = self.network_status
+            else:
+                result = "Вы победили!" if self.network_won else "Соперник победил!"
+            messages.append((result, -60))
             # показываем сообщение о том, как закрыть игру
-            self.display_message("Нажмите крестик, чтобы закрыть игру", 60)
+            messages.append(("Нажмите крестик, чтобы закрыть игру", 60))
 
         if not self.is_game_started:  # если игра еще не началась (расставляем корабли)
             # показываем информацию о текущем корабле
@@ -155,110 +282,43 @@ class BattleshipGame:
             orientation = "Горизонтально" if self.horizontal else "Вертикально"
 
             # выводим подсказки
-            self.display_message(ships_left, -60)
-            self.display_message(f"Ориентация: {orientation} (ПКМ для изменения)", -20)
-            self.display_message("ЛКМ для размещения корабля", 20)
+            messages.append((ships_left, -60))
+            messages.append((f"Ориентация: {orientation} (ПКМ для изменения)", -20))
+            messages.append(("ЛКМ для размещения корабля", 20))
 
             # показываем сколько каких кораблей осталось разместить
             remaining = "Осталось разместить: "
             for size, count in self.ships_to_place.items():
                 if count > 0:
                     remaining += f"{count}x{size} "  # например: 1x4 2x3 3x2
-            self.display_message(remaining, 60)
+            messages.append((remaining, 60))
+        elif self.network_status is not None and not self.game_over:
+            # по сети: ждем соперника или его расстановку
+            messages.append((self.network_status, -60))
         else:  # если игра уже идет
             if not self.game_over:  # и игра не закончилась
                 # показываем статистику попаданий
                 player_status = f"Вы попали: {self.player_hits}/{self.total_ship_cells}"
+                opponent = "Компьютер" if self.network is None else "Соперник"
                 computer_status = (
-                    f"Компьютер попал: {self.computer_hits}/{self.total_ship_cells}"
+                    f"{opponent} попал: {self.computer_hits}/{self.total_ship_cells}"
                 )
-                self.display_message(player_status, -20)
-                self.display_message(computer_status, 20)
+                messages.append((player_status, -20))
+                messages.append((computer_status, 20))
 
                 # показываем чей сейчас ход
-                turn_message = "Ваш ход" if self.is_player_turn else "Ход компьютера"
-                self.display_message(turn_message, -60)
+                if self.is_player_turn:
+                    turn_message = "Ваш ход"
+                elif self.network is None:
+                    turn_message = "Ход компьютера"
+                else:
+                    turn_message = "Ход соперника"
+                messages.append((turn_message, -60))
 
                 # если ход игрока, показываем подсказку
                 if self.is_player_turn:
-                    self.display_message(
-                        "Кликните по правому полю, чтобы атаковать", 60
-                    )
-
-        # подписываем поля игрока и компьютера
-        player_field_text = self.font.render("Ваше поле", True, BLACK)
-        computer_field_text = self.font.render("Поле компьютера", True, BLACK)
-
-        # размещаем подписи над полями
-        self.screen.blit(player_field_text, (MARGIN, MARGIN - 30))
-        self.screen.blit(computer_field_text, (WINDOW_WIDTH // 2 + MARGIN, MARGIN - 30))
-
-    def place_computer_ships(self):
-        """
-        Компьютер расставляет свои корабли случайным образом
-        """
-        # перебираем все корабли
-        for ship_size, count in SHIPS.items():
-            # для каждого размера корабля расставляем нужное количество
-            for _ in range(count):
-                while True:  # пытаемся поставить корабль, пока не получится
-                    # выбираем случайные координаты
-                    x = random.randint(
-                        0, GRID_SIZE - 1
-                    )  # случайная позиция по горизонтали
-                    y = random.randint(
-                        0, GRID_SIZE - 1
-                    )  # случайная позиция по вертикали
-                    horizontal = random.choice([True, False])  # случайная ориентация
-
-                    # проверяем, можно ли поставить корабль
-                    if self.can_place_ship(
-                        self.computer_field, x, y, ship_size, horizontal
-                    ):
-                        # если можно - ставим и переходим к следующему кораблю
-                        self.place_ship(
-                            self.computer_field, x, y, ship_size, horizontal
-                        )
-                        break  # выходим из while True
-
-    def can_place_ship(self, field, x, y, size, horizontal):
-        """
-        Проверяет, можно ли поставить корабль в указанное место
-        field - поле, на котором ставим
-        x, y - координаты начала корабля
-        size - размер корабля
-        horizontal - как ставим (горизонтально или вертикально)
-        """
-        if horizontal:  # если ставим горизонтально
-            if x + size > GRID_SIZE:  # проверяем, не вылезет ли корабль за поле вправо
-                return False
-            # проверяем клетки вокруг корабля (корабли не должны касаться друг друга)
-            for i in range(max(0, x - 1), min(GRID_SIZE, x + size + 1)):
-                for j in range(max(0, y - 1), min(GRID_SIZE, y + 2)):
-                    if field[j][i] != 0:  # если клетка не пустая
-                        return False
-        else:  # если ставим вертикально
-            if y + size > GRID_SIZE:  # проверяем, не вылезет ли корабль за поле вниз
-                return False
-            # проверяем клетки вокруг корабля
-            for i in range(max(0, x - 1), min(GRID_SIZE, x + 2)):
-                for j in range(max(0, y - 1), min(GRID_SIZE, y + size + 1)):
-                    if field[j][i] != 0:  # если клетка не пустая
-                        return False
-        return True  # если все проверки прошли - корабль можно ставить
-
-    def place_ship(self, field, x, y, size, horizontal):
-        """
-        Ставит корабль на поле
-        field - поле, на котором ставим
-        x, y - координаты начала корабля
-        size - размер корабля
-        horizontal - как ставим (горизонтально или вертикально)
-        """
-        if horizontal:  # если горизонтально
-            field[y, x : x + size] = SHIP  # заполняем клетки по горизонтали
-        else:  # если вертикально
-            field[y : y + size, x] = SHIP  # заполняем клетки по вертикали
+                    messages.append(("Кликните по правому полю, чтобы атаковать", 60))
+        return messages
 
     def draw_grid(self, left_top_x):
         """
@@ -266,8 +326,8 @@ class BattleshipGame:
         left_top_x - отступ слева (чтобы нарисовать два поля рядом)
         """
         # рисуем вертикальные и горизонтальные линии
-        for i in range(GRID_SIZE):
-            for j in range(GRID_SIZE):
+        for i in range(self.grid_size):
+            for j in range(self.grid_size):
                 # рисуем квадратик для каждой клетки
                 pygame.draw.rect(
                     self.screen,  # где рисуем
@@ -286,9 +346,9 @@ class BattleshipGame:
         Рисует корабли и попадания/промахи на обоих полях
         """
         # сначала рисуем поле игрока
-        for i in range(GRID_SIZE):
-            for j in range(GRID_SIZE):
-                if self.player_field[i][j] == SHIP:  # если в клетке корабль
+        for i in range(self.grid_size):
+            for j in range(self.grid_size):
+                if self.player_field[i, j] == SHIP:  # если в клетке корабль
                     # рисуем синий квадратик
                     pygame.draw.rect(
                         self.screen,
@@ -300,7 +360,7 @@ class BattleshipGame:
                             CELL_SIZE - 1,
                         ),
                     )
-                elif self.player_field[i][j] == MISS:  # если в клетке промах
+                elif self.player_field[i, j] == MISS:  # если в клетке промах
                     # рисуем серый кружок
                     pygame.draw.circle(
                         self.screen,
@@ -311,7 +371,7 @@ class BattleshipGame:
                         ),
                         5,  # радиус кружка
                     )
-                elif self.player_field[i][j] == HIT:  # если в клетке попадание
+                elif self.player_field[i, j] == HIT:  # если в клетке попадание
                     # рисуем красный квадратик
                     pygame.draw.rect(
                         self.screen,
@@ -324,9 +384,9 @@ class BattleshipGame:
                         ),
                     )
         # теперь рисуем поле компьютера (только то, что видит игрок)
-        for i in range(GRID_SIZE):
-            for j in range(GRID_SIZE):
-                if self.computer_visible_field[i][j] == MISS:  # если промах
+        for i in range(self.grid_size):
+            for j in range(self.grid_size):
+                if self.computer_visible_field[i, j] == MISS:  # если промах
                     # рисуем серый кружок
                     pygame.draw.circle(
                         self.screen,
@@ -337,7 +397,7 @@ class BattleshipGame:
                         ),
                         5,
                     )
-                elif self.computer_visible_field[i][j] == HIT:  # если попадание
+                elif self.computer_visible_field[i, j] == HIT:  # если попадание
                     # рисуем красный квадратик
                     pygame.draw.rect(
                         self.screen,
@@ -350,140 +410,421 @@ class BattleshipGame:
                         ),
                     )
 
-    def check_game_over(self):
-        """
-        Проверяет, не закончилась ли игра
-        Возвращает сообщение о победителе или None, если игра продолжается
-        """
-        # если игрок попал во все клетки с кораблями компьютера
-        if self.player_hits == self.total_ship_cells:
-            self.game_over = True
-            return "Вы победили!"
-        # если компьютер попал во все клетки с кораблями игрока
-        elif self.computer_hits == self.total_ship_cells:
-            self.game_over = True
-            return "Компьютер победил!"
-        return None  # игра продолжается
-
-    def computer_move(self):
-        """
-        Ход компьютера (пока что просто случайные выстрелы)
-        """
-        while True:  # пытаемся сделать ход, пока не получится
-            # выбираем случайные координаты для выстрела
-            x = random.randint(0, GRID_SIZE - 1)
-            y = random.randint(0, GRID_SIZE - 1)
-            # проверяем, не стреляли ли мы уже в эту клетку
-            if self.player_field[y][x] in [EMPTY, SHIP]:
-                if self.player_field[y][x] == EMPTY:
-                    self.player_field[y][x] = MISS  # если пусто - промах
-                    self.is_player_turn = True  # передаем ход игроку
-                else:
-                    self.player_field[y][x] = HIT  # если корабль - попадание
-                    self.computer_hits += 1  # увеличиваем счетчик попаданий
-                break  # ход сделан, выходим из цикла
-
     def handle_click(self, pos, button):
         """
         Обрабатывает клики мышкой
         pos - координаты клика
         button - какая кнопка нажата (1 - левая, 3 - правая)
         """
-        # пересчитываем координаты клика в координаты поля
-        x = (pos[0] - (WINDOW_WIDTH // 2 + MARGIN)) // CELL_SIZE
-        y = (pos[1] - MARGIN) // CELL_SIZE
+        if button in (4, 5):  # это прокрутка колеса мыши, а не клик
+            return
+        cell = self.cell_at(pos)
+        if cell is None:  # кликнули мимо полей
+            return
+        board, x, y = cell
 
         if not self.is_game_started:  # если расставляем корабли
-            x = (pos[0] - MARGIN) // CELL_SIZE  # координаты для левого поля
-            if 0 <= x < GRID_SIZE and 0 <= y < GRID_SIZE:  # если кликнули по полю
+            if board == 0:  # корабли ставим на левое поле
                 if button == 3:  # правая кнопка - меняем ориентацию
                     self.horizontal = not self.horizontal
                 elif button == 1:  # левая кнопка - пытаемся поставить корабль
-                    if (
-                        self.ships_to_place[self.current_ship_size] > 0
-                    ):  # если остались корабли
-                        # проверяем, можно ли поставить корабль
-                        if self.can_place_ship(
-                            self.player_field,
-                            x,
-                            y,
-                            self.current_ship_size,
-                            self.horizontal,
-                        ):
-                            # ставим корабль
-                            self.place_ship(
-                                self.player_field,
-                                x,
-                                y,
-                                self.current_ship_size,
-                                self.horizontal,
-                            )
-                            # уменьшаем количество кораблей этого размера
-                            self.ships_to_place[self.current_ship_size] -= 1
-
-                            # если корабли этого размера закончились
-                            if self.ships_to_place[self.current_ship_size] == 0:
-                                # ищем следующий размер корабля
-                                sizes = list(self.ships_to_place.keys())
-                                sizes.sort(reverse=True)  # от большего к меньшему
-                                for size in sizes:
-                                    if self.ships_to_place[size] > 0:
-                                        self.current_ship_size = size
-                                        break
-                                else:  # если все корабли расставлены
-                                    self.is_game_started = True  # начинаем игру
-
-        # если игра началась и ход игрока
-        elif self.is_player_turn and 0 <= x < GRID_SIZE and 0 <= y < GRID_SIZE:
-            # если в эту клетку еще не стреляли
-            if self.computer_visible_field[y][x] == EMPTY:
-                if self.computer_field[y][x] == EMPTY:
-                    self.computer_visible_field[y][x] = MISS  # промах
-                    self.is_player_turn = False  # передаем ход компьютеру
-                else:
-                    self.computer_visible_field[y][x] = HIT  # попадание
-                    self.player_hits += 1  # увеличиваем счетчик попаданий
-
-    def run(self):
+                    self.place_player_ship(x, y, self.horizontal)
+                    self.send_fleet()
+
+        # если игра началась и ход игрока - стреляем по полю компьютера
+        elif board == 1:
+            if self.network is None:
+                self.player_shot(x, y)
+            elif (
+                self.is_player_turn
+                and not self.shot_sent
+                and self.computer_visible_field[y, x] == EMPTY
+            ):
+                # по сети результат выстрела скажет сервер
+                self.network.send_shot(x, y)
+                self.shot_sent = True
+
+    def cell_at(self, pos):
         """
-        Основной игровой цикл
+        Пересчитывает координаты точки окна в клетку поля
+        Возвращает (номер поля: 0 - левое, 1 - правое, x, y) или None
         """
-        running = True
-        while running:
-            self.screen.fill(WHITE)  # заполняем экран белым
+        for board, left in enumerate((MARGIN, WINDOW_WIDTH // 2 + MARGIN)):
+            px, py = pos[0] - left, pos[1] - MARGIN
+            if self.viewport is not None:
+                cell = self.viewport.cell_at(px, py)
+                if cell is not None:
+                    return board, cell[0], cell[1]
+            elif px >= 0 and py >= 0:
+                x, y = px // CELL_SIZE, py // CELL_SIZE
+                if x < self.grid_size and y < self.grid_size:
+                    return board, x, y
+        return None
+
+    def draw_frame(self):
+        """
+        Рисует кадр и показывает его на экране
+        """
+        profiler = self.profiler
+        if self.renderer is not None:
+            dirty = []
+            if self.overlay.rect is not None:
+                # стираем старую табличку замеров, клетки под ней дорисуются
+                dirty.append(self.renderer.invalidate(self.overlay.rect))
+                self.overlay.rect = None
+            # дорисовываем только изменения и обновляем только их на экране
+            with profiler.section("render"):
+                dirty += self.renderer.update(
+                    [self.player_field, self.computer_visible_field],
+                    self.status_messages(),
+                )
+            if self.overlay.visible:
+                dirty.append(self.overlay.draw(self.screen))
+            if dirty:
+                with profiler.section("display.update"):
+                    pygame.display.update(dirty)
+            return
+
+        self.screen.fill(WHITE)  # заполняем экран белым
 
-            # рисуем сетку для обоих полей
+        # рисуем сетку для обоих полей
+        with profiler.section("draw_grid"):
             self.draw_grid(MARGIN)  # левое поле
             self.draw_grid(WINDOW_WIDTH // 2 + MARGIN)  # правое поле
 
+        with profiler.section("draw_ships"):
             self.draw_ships()  # рисуем корабли и попадания/промахи
+        with profiler.section("draw_game_state"):
             self.draw_game_state()  # рисуем информацию о состоянии игры
+        if self.overlay.visible:
+            self.overlay.draw(self.screen)
+        with profiler.section("display.flip"):
+            pygame.display.flip()  # обновляем экран
 
-            # проверяем, не закончилась ли игра
-            game_result = self.check_game_over()
-            if game_result and not self.game_over:  # добавляем проверку флага game_over
-                self.game_over = True  # отмечаем что игра закончена
-                self.display_message(game_result, -100)  # показываем результат
+    def handle_key(self, key):
+        """
+        Отладочные клавиши: F3 - табличка замеров, F4 - сохранить замеры
+        """
+        if key == OVERLAY_KEY:
+            self.overlay.visible = not self.overlay.visible
+            # без флага profile замеры идут, только пока видна табличка
+            self.profiler.enabled = self.profile or self.overlay.visible
+        elif key == DUMP_KEY and self.profiler.samples:
+            count = self.profiler.dump(self.profile_path)
+            print(f"Замеры {count} кадров сохранены в {self.profile_path}")
+        elif self.viewport is not None:
+            if key in SCROLL_KEYS:  # листаем на четверть видимой части
+                dx, dy = SCROLL_KEYS[key]
+                step = max(1, self.viewport.cells // 4)
+                self.viewport.scroll(dx * step, dy * step)
+            elif key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                self.viewport.zoom(1)
+            elif key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                self.viewport.zoom(-1)
+
+    def handle_wheel(self, steps):
+        """
+        Колесо мыши на большом поле: масштаб вокруг клетки под курсором
+        """
+        if self.viewport is None:
+            return
+        cell = self.cell_at(pygame.mouse.get_pos())
+        anchor = None if cell is None else cell[1:]
+        self.viewport.zoom(steps, anchor)
 
-            # обрабатываем события pygame
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:  # если нажали крестик
-                    running = False
-                elif event.type == pygame.MOUSEBUTTONDOWN and not self.game_over:
-                    # если кликнули мышкой и игра не закончена
-                    self.handle_click(event.pos, event.button)
-
-            # если ход компьютера
-            if not self.is_player_turn and self.is_game_started and not self.game_over:
-                pygame.time.wait(500)  # ждем пол секунды (чтобы успеть увидеть ход)
-                self.computer_move()  # компьютер делает ход
+    def send_fleet(self):
+        """
+        По сети: отправляет расстановку, когда все корабли расставлены
+        и соперник найден
+        """
+        if (
+            self.network is None
+            or self.fleet_sent
+            or not self.is_game_started
+            or self.network_status == "Ждем соперника..."
+        ):
+            return
+        self.network.send_placements(
+            [
+                (ship.x, ship.y, ship.size, ship.horizontal)
+                for ship in self.player_fleet.ships
+            ]
+        )
+        self.fleet_sent = True
+        self.network_status = "Соперник расставляет корабли..."
 
-            pygame.display.flip()  # обновляем экран
+    def handle_network(self):
+        """
+        Разбирает сообщения сервера: поля меняются только по ним
+        """
+        from network import (
+            ERROR,
+            GAME_OVER,
+            MATCHED,
+            OPPONENT_LEFT,
+            RESULT,
+            START,
+            mark_shot,
+        )
+
+        for kind, fields in self.network.poll():
+            if kind == MATCHED:
+                _, ships = fields
+                if ships != self.ships:
+                    self.network_status = "У соперника другой набор кораблей"
+                    self.game_over = True
+                else:
+                    self.network_status = "Соперник найден"
+                    self.send_fleet()
+            elif kind == START:
+                self.network_status = None
+                self.is_player_turn = bool(fields)
+            elif kind == RESULT:
+                shooter, x, y, result, sunk = fields
+                self.shot_log.append((x, y, result))
+                if shooter == 0:  # наш выстрел
+                    self.shot_sent = False
+                    mark_shot(
+                        self.computer_visible_field, self.grid_size, x, y, result, sunk
+                    )
+                    if result == HIT:
+                        self.player_hits += 1
+                    else:
+                        self.is_player_turn = False
+                elif result == HIT:  # соперник попал в нас
+                    self.player_field[y, x] = HIT
+                    self.computer_hits += 1
+                    self._register_hit(self.player_fleet, self.player_field, x, y)
+                else:
+                    self.player_field[y, x] = MISS
+                    self.is_player_turn = True
+            elif kind == GAME_OVER:
+                self.network_won = bool(fields)
+                self.game_over = True
+            elif kind == OPPONENT_LEFT and not self.game_over:
+                self.network_status = "Соединение с соперником потеряно"
+                self.game_over = True
+            elif kind == ERROR:
+                # сервер не принял выстрел (так быть не должно) - можно стрелять снова
+                self.shot_sent = False
+
+    def check_game_over(self):
+        """
+        По сети конец партии объявляет сервер (GAME_OVER): флота соперника
+        мы не знаем, а по своему флоту не узнать, кто победил
+        """
+        if self.network is not None:
+            return None
+        return super().check_game_over()
+
+    def schedule_computer_move(self):
+        """
+        Если сейчас ход компьютера, заводит таймер на его выстрел
+        (вместо pygame.time.wait, который замораживает окно)
+        """
+        if (
+            self.network is not None  # по сети стреляет не компьютер
+            or self.is_player_turn
+            or not self.is_game_started
+            or self.game_over
+            or self.computer_move_scheduled
+            or self.pending_shot is not None
+        ):
+            return
+        self.computer_move_scheduled = True
+        if self.computer_delay > 0:
+            pygame.time.set_timer(COMPUTER_MOVE_EVENT, self.computer_delay, loops=1)
+        else:
+            pygame.event.post(pygame.event.Event(COMPUTER_MOVE_EVENT))
+
+    def start_computer_move(self, executor):
+        """
+        Компьютер начинает думать над выстрелом в отдельном потоке,
+        чтобы окно не зависало, даже если стратегия думает долго
+        """
+        self.computer_move_scheduled = False
+        if self.is_player_turn or self.game_over:
+            return
+        self.pending_shot = executor.submit(self.think)
+
+    def think(self):
+        """
+        Выбор выстрела компьютером (в отдельном потоке)
+        Возвращает координаты и сколько секунд компьютер думал
+        """
+        start = time.perf_counter()
+        x, y = self.ai.choose_shot()
+        return x, y, time.perf_counter() - start
+
+    def finish_computer_move(self):
+        """
+        Если компьютер придумал выстрел, стреляет (в основном потоке)
+        """
+        if self.pending_shot is None or not self.pending_shot.done():
+            return
+        x, y, seconds = self.pending_shot.result()
+        self.pending_shot = None
+        self.profiler.add("ai_think", seconds)
+        with self.profiler.section("computer_move"):
+            self.computer_shot(x, y)
+
+    def save_record(self):
+        """
+        Дописывает законченную партию в файл (один раз)
+        """
+        # партию по сети не записываем: флот соперника нам неизвестен
+        if self.recorder is None or self.recorded or self.network is not None:
+            return
+        self.recorder.write_game(self)
+        self.recorder.flush()
+        self.recorded = True
+
+    def run(self):
+        """
+        Основной игровой цикл
+
+        Цикл не крутится впустую: если ничего не происходит, он спит
+        до следующего события (клик, таймер хода компьютера, закрытие окна)
+        """
+        clock = pygame.time.Clock()
+        # движение мыши нам не нужно - пусть не будит цикл
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
+        executor = ThreadPoolExecutor(max_workers=1)  # поток для ходов компьютера
+
+        profiler = self.profiler
+        running = True
+        while running:
+            profiler.begin_frame()
+            if self.network is None:
+                self.check_game_over()  # проверяем, не закончилась ли игра
+            if self.game_over:
+                self.save_record()
+            self.schedule_computer_move()  # если ход компьютера - заводим таймер
+            self.draw_frame()  # рисуем кадр
+
+            # ждем события; пока компьютер думает - просыпаемся каждый кадр,
+            # чтобы забрать его выстрел, а пока видна табличка замеров -
+            # время от времени, чтобы ее обновить
+            with profiler.section("wait"):
+                if self.pending_shot is not None:
+                    # fps=0 - без ограничения кадров, тогда просыпаемся
+                    # каждую миллисекунду (0 в wait означал бы "ждать вечно")
+                    timeout = max(1, 1000 // self.fps) if self.fps else 1
+                    events = [pygame.event.wait(timeout)]
+                elif self.overlay.visible:
+                    events = [pygame.event.wait(OVERLAY_REFRESH)]
+                else:
+                    events = [pygame.event.wait()]
+                events += pygame.event.get()
 
+            # обрабатываем события pygame
+            with profiler.section("events"):
+                for event in events:
+                    if event.type == pygame.QUIT:  # если нажали крестик
+                        running = False
+                    elif event.type == pygame.MOUSEBUTTONDOWN and not self.game_over:
+                        # если кликнули мышкой и игра не закончена
+                        self.handle_click(event.pos, event.button)
+                    elif event.type == pygame.KEYDOWN:
+                        self.handle_key(event.key)
+                    elif event.type == pygame.MOUSEWHEEL:
+                        self.handle_wheel(event.y)
+                    elif event.type == COMPUTER_MOVE_EVENT:  # компьютеру пора стрелять
+                        self.start_computer_move(executor)
+                    elif event.type == NETWORK_EVENT:  # сообщение от сервера
+                        self.handle_network()
+                    elif (
+                        event.type == pygame.WINDOWEXPOSED and self.renderer is not None
+                    ):
+                        # окно было закрыто другим окном - рисуем все заново
+                        pygame.display.update(self.renderer.redraw())
+
+            self.finish_computer_move()
+            with profiler.section("wait"):
+                clock.tick(self.fps)  # не рисуем чаще, чем fps раз в секунду
+            profiler.end_frame()
+
+        executor.shutdown(cancel_futures=True)
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.network is not None:
+            self.network.close()
         pygame.quit()  # закрываем pygame
 
 
+def parse_server(text):
+    """
+    "хост:порт" -> (хост, порт)
+    """
+    host, _, port = text.rpartition(":")
+    if not host or not port.isdigit():
+        raise argparse.ArgumentTypeError(f"нужно хост:порт, а не {text!r}")
+    return host, int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Морской бой")
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE)
+    parser.add_argument(
+        "--fill-ratio",
+        type=float,
+        default=0.25,
+        help="какую часть поля занимают корабли",
+    )
+    parser.add_argument(
+        "--difficulty", default="random", help="уровень компьютера (см. ai.py)"
+    )
+    parser.add_argument("--fps", type=int, default=FPS)
+    parser.add_argument(
+        "--delay",
+        type=int,
+        default=COMPUTER_DELAY,
+        help="пауза перед выстрелом компьютера в мс",
+    )
+    parser.add_argument(
+        "--full-redraw",
+        action="store_true",
+        help="перерисовывать весь кадр (без renderer.py)",
+    )
+    parser.add_argument(
+        "--large-board",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="режим большого поля (по умолчанию - если поле не влезает в окно); "
+        "на полях в сотни клеток smart строит таблицы на гигабайты - берите random",
+    )
+    parser.add_argument("--profile", action="store_true", help="замерять кадры")
+    parser.add_argument("--profile-path", default="profile.jsonl")
+    parser.add_argument("--record", help="дописывать партию в этот файл")
+    parser.add_argument(
+        "--connect",
+        type=parse_server,
+        metavar="ХОСТ:ПОРТ",
+        help="играть по сети через сервер network.py",
+    )
+    args = parser.parse_args(argv)
+
+    # автоматически рассчитываем корабли для заданного размера поля
+    ships = calculate_ships_for_grid(args.grid_size, args.fill_ratio)
+    print(f"Размер поля: {args.grid_size}x{args.grid_size}")
+    print(f"Расстановка кораблей: {ships}")
+
+    game = BattleshipGame(
+        args.grid_size,
+        ships,
+        difficulty=args.difficulty,
+        dirty_rendering=not args.full_redraw,
+        fps=args.fps,
+        computer_delay=args.delay,
+        profile=args.profile,
+        profile_path=args.profile_path,
+        large_board=args.large_board,
+        record_path=args.record,
+        server=args.connect,
+    )
+    game.run()
+
+
 # запускаем игру, если файл запущен напрямую
 if __name__ == "__main__":
-    game = BattleshipGame()  # создаем игру
-    game.run()  # запускаем игру
+    main()
@@ -0,0 +1,285 @@
+"""
+Монте-Карло для сильного компьютера: куда вероятнее всего стрелять.
+
+Планировщик много раз случайно расставляет оставшиеся корабли так, чтобы
+расстановка не противоречила тому, что уже известно:
+- корабли не стоят на промахах и в ореолах потопленных кораблей
+- каждое попадание по непотопленному кораблю накрыто каким-то кораблем
+- корабли не касаются друг друга (как в can_place_ship)
+Потом считает, как часто каждая клетка оказалась под кораблем. Стрелять
+лучше всего туда, где корабль оказывался чаще всего.
+
+Планировщик работает "сколько есть времени": расстановки перебираются,
+пока не кончится бюджет (budget секунд), и возвращается то, что успели
+насчитать. Расстановки считают одновременно текущий поток и процессы из
+пула (workers штук) - в Python потоки не ускоряют вычисления.
+
+Сколько расстановок в секунду получается при разном числе процессов:
+    python montecarlo.py --grid-size 10 --workers 0 1 2 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+import numpy as np
+
+from engine import GRID_SIZE, calculate_ships_for_grid
+from placement import placement_table
+
+BUDGET = 0.1  # сколько секунд думать над выстрелом
+# процессы в помощь текущему потоку (один процессор оставляем окну игры)
+WORKERS = min(4, (os.cpu_count() or 1) - 1)
+RANDOM_TRIES = 16  # случайных попыток поставить корабль до полного перебора
+
+
+class FleetSampler:
+    """
+    Случайные расстановки оставшихся кораблей, согласные с наблюдениями
+    Таблица расстановок (placement.py) строится один раз на поле и флот
+    """
+
+    def __init__(self, grid_size, sizes):
+        self.grid_size = grid_size
+        self.table = placement_table(grid_size, sizes)
+
+    def sample(self, rng, blocked, hits, ships_left):
+        """
+        Одна расстановка: список номеров расстановок из таблицы
+        или None, если случайный выбор зашел в тупик
+        blocked - bytearray, 1 - здесь корабля точно нет (промах, ореол)
+        hits - попадания по непотопленным кораблям
+        ships_left - {размер: сколько таких кораблей еще плавает}
+        """
+        table = self.table
+        taken = bytearray(blocked)  # клетки, где кораблю уже нельзя стоять
+        left = dict(ships_left)
+        chosen = []
+
+        # сначала корабли через попадания: каждое должно быть накрыто
+        hits = set(hits)
+        uncovered = set(hits)
+        while uncovered:
+            hit = min(uncovered)
+            candidates = [
+                placement_id
+                for placement_id in table.covering[hit]
+                if left.get(table.placements[placement_id][2], 0) > 0
+                and not any(taken[cell] for cell in table.cells[placement_id])
+                # корабль целиком из попаданий был бы уже потоплен
+                and not all(cell in hits for cell in table.cells[placement_id])
+            ]
+            if not candidates:
+                return None
+            placement_id = rng.choice(candidates)
+            self._take(placement_id, taken, left, chosen)
+            uncovered.difference_update(table.cells[placement_id])
+            # попадание в ореоле нового корабля накрыть уже нечем
+            if any(taken[cell] for cell in uncovered):
+                return None
+
+        # остальные корабли - куда угодно, от больших к малым
+        for size in sorted(left, reverse=True):
+            ids = table.by_size[size]
+            for _ in range(left[size]):
+                for _ in range(RANDOM_TRIES):
+                    placement_id = ids[int(rng.random() * len(ids))]
+                    if not any(taken[cell] for cell in table.cells[placement_id]):
+                        break
+                else:
+                    free = [
+                        placement_id
+                        for placement_id in ids
+                        if not any(taken[cell] for cell in table.cells[placement_id])
+                    ]
+                    if not free:
+                        return None
+                    placement_id = rng.choice(free)
+                self._take(placement_id, taken, left, chosen)
+        return chosen
+
+    def _take(self, placement_id, taken, left, chosen):
+        for cell in self.table.zones[placement_id]:
+            taken[cell] = 1
+        left[self.table.placements[placement_id][2]] -= 1
+        chosen.append(placement_id)
+
+
+@lru_cache(maxsize=8)
+def fleet_sampler(grid_size, sizes):
+    return FleetSampler(grid_size, sizes)
+
+
+def sample_counts(grid_size, sizes, blocked, hits, ships_left, seed, deadline, limit):
+    """
+    Считает расстановки до момента deadline (по time.time(), одинаковому
+    во всех процессах; None - без ограничения) или пока не насчитает limit
+    Возвращает (сколько раз каждая клетка была под кораблем, расстановок,
+    попыток). Функция верхнего уровня - ее можно отдать процессу из пула
+    """
+    sampler = fleet_sampler(grid_size, sizes)
+    cells = sampler.table.cells
+    rng = random.Random(seed)
+    counts = [0] * (grid_size * grid_size)
+    samples = attempts = 0
+    while limit is None or samples < limit:
+        # время проверяем не на каждой попытке - это тоже стоит времени
+        if deadline is not None and attempts % 8 == 0 and time.time() > deadline:
+            break
+        attempts += 1
+        chosen = sampler.sample(rng, blocked, hits, ships_left)
+        if chosen is None:
+            continue
+        samples += 1
+        for placement_id in chosen:
+            for cell in cells[placement_id]:
+                counts[cell] += 1
+    return counts, samples, attempts
+
+
+_pools = {}  # число процессов -> пул (создается при первом обращении)
+
+
+def worker_pool(workers):
+    """
+    Общий пул процессов или None, если процессы здесь не нужны или нельзя
+    (процесс из multiprocessing.Pool, например в tournament.py,
+    не может заводить свои процессы)
+    """
+    if workers <= 0 or multiprocessing.current_process().daemon:
+        return None
+    if workers not in _pools:
+        # "spawn", а не fork: в окне игры уже работают потоки pygame
+        _pools[workers] = ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pools[workers]
+
+
+def drop_pool(workers):
+    """
+    Забывает сломанный пул (например, процесс убили) - при следующем
+    выстреле создастся новый
+    """
+    pool = _pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+class MonteCarloPlanner:
+    """
+    Подсчет клеток под кораблями по случайным расстановкам флота
+    budget - сколько секунд считать на один выстрел
+    workers - сколько процессов помогают текущему потоку
+    samples - вместо времени считать ровно столько расстановок в текущем
+    потоке (без пула; с одним зерном результат повторяется)
+    """
+
+    def __init__(self, grid_size, ships, budget=None, workers=None, samples=None):
+        self.grid_size = grid_size
+        self.sizes = tuple(sorted(ships))
+        self.budget = BUDGET if budget is None else budget
+        self.workers = WORKERS if workers is None else workers
+        self.samples = samples
+        self.last_samples = 0  # сколько расстановок насчитали в прошлый раз
+        self.last_attempts = 0
+
+    def plan(self, blocked, hits, ships_left, rng=random):
+        """
+        Возвращает массив: сколько раз каждая клетка (y * размер + x)
+        оказалась под кораблем, и сколько всего было расстановок
+        """
+        args = (self.grid_size, self.sizes, bytes(blocked), tuple(hits), ships_left)
+        pool = None if self.samples is not None else worker_pool(self.workers)
+        # один и тот же момент окончания для всех процессов: задача, которая
+        # дождалась своей очереди слишком поздно, сразу заканчивается
+        deadline = None if self.samples is not None else time.time() + self.budget
+        futures = []
+        if pool is not None:
+            try:
+                for _ in range(self.workers):
+                    futures.append(
+                        pool.submit(
+                            sample_counts, *args, rng.getrandbits(64), deadline, None
+                        )
+                    )
+            except BrokenProcessPool:
+                drop_pool(self.workers)
+        counts, samples, attempts = sample_counts(
+            *args, rng.getrandbits(64), deadline, self.samples
+        )
+        total = np.array(counts, dtype=np.int64)
+
+        if futures:
+            # опоздавших (например, пока пул только запускается) не ждем,
+            # а еще не начатые задачи отменяем, чтобы они не задерживали
+            # следующий выстрел
+            left = deadline - time.time()
+            done, late = wait(futures, timeout=max(0.0, left) + 0.02)
+            for future in late:
+                future.cancel()
+            for future in done:
+                try:
+                    counts, more_samples, more_attempts = future.result()
+                except BrokenProcessPool:
+                    # процессы умерли - хватит и того, что насчитал этот поток
+                    drop_pool(self.workers)
+                    break
+                total += counts
+                samples += more_samples
+                attempts += more_attempts
+        self.last_samples = samples
+        self.last_attempts = attempts
+        return total, samples
+
+
+def measure_scaling(grid_size, ships, workers_list, seconds=1.0, repeats=3):
+    """
+    Сколько расстановок в секунду считается на пустом поле при разном
+    числе процессов в пуле
+    Возвращает {процессов: расстановок в секунду}
+    """
+    blocked = bytearray(grid_size * grid_size)
+    rates = {}
+    for workers in workers_list:
+        planner = MonteCarloPlanner(grid_size, ships, seconds, workers)
+        rng = random.Random(0)
+        planner.plan(blocked, (), ships, rng)  # запуск пула и таблиц
+        best = 0.0
+        for _ in range(repeats):
+            start = time.perf_counter()
+            _, samples = planner.plan(blocked, (), ships, rng)
+            best = max(best, samples / (time.perf_counter() - start))
+        rates[workers] = best
+    return rates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Скорость Монте-Карло при разном числе процессов"
+    )
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE)
+    parser.add_argument("--fill-ratio", type=float, default=0.25)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=1.0, help="бюджет замера")
+    args = parser.parse_args(argv)
+
+    ships = calculate_ships_for_grid(args.grid_size, args.fill_ratio)
+    print(f"Поле {args.grid_size}x{args.grid_size}, флот {ships}")
+    print(f"Процессоров: {os.cpu_count()}")
+    rates = measure_scaling(args.grid_size, ships, args.workers, args.seconds)
+    base = rates[args.workers[0]]
+    for workers, rate in rates.items():
+        print(
+            f"процессов в пуле: {workers:>2}  расстановок/с: {rate:>10.0f}"
+            f"  ускорение: {rate / base:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
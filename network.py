@@ -0,0 +1,657 @@
+"""
+Игра по сети: сервер матчей и клиент на asyncio.
+
+Сообщения маленькие и двоичные: длина (2 байта), тип (1 байт) и поля.
+Клетка передается числом y * размер + x (2 байта, на полях больше
+128x128 - 4 байта), у расстановки старший бит клетки - "горизонтально".
+Сервер не пересылает поля целиком, а только изменения: результат выстрела
+и, если корабль потоплен, его расстановку (клетки вокруг него клиент
+помечает промахами сам).
+
+Ход партии:
+    клиент -> JOIN(размер поля)
+    сервер -> MATCHED(размер поля, номер игрока, флот), когда нашелся соперник
+    клиент -> PLACE(расстановки)
+    сервер -> START(ваш ход?), когда расставились оба
+    клиент -> SHOT(клетка)
+    сервер -> RESULT(кто стрелял, клетка, результат, потопленный корабль)
+    сервер -> GAME_OVER(вы победили?)
+
+Один процесс сервера держит тысячи партий: каждая партия - это движок
+BattleshipEngine, а на каждый выстрел тратится несколько микросекунд.
+
+Примеры:
+    python network.py server --port 8765
+    python network.py bot --port 8765 --games 10
+    python network.py load --matches 1000
+"""
+
+import argparse
+import asyncio
+import queue
+import random
+import statistics
+import struct
+import threading
+import time
+from collections import Counter
+
+from ai import make_ai
+from engine import (
+    GRID_SIZE,
+    HIT,
+    MISS,
+    BattleshipEngine,
+    Ship,
+    calculate_ships_for_grid,
+    can_place_ship,
+    default_placement,
+    new_field,
+    place_ship,
+    rejection_fleet,
+)
+from placement import FleetGenerator
+from record import is_wide
+
+# типы сообщений клиента
+JOIN = 1
+PLACE = 2
+SHOT = 3
+# типы сообщений сервера
+MATCHED = 10
+START = 11
+RESULT = 12
+GAME_OVER = 13
+ERROR = 14
+OPPONENT_LEFT = 15
+
+# коды ошибок
+BAD_MESSAGE = 1
+BAD_PLACEMENT = 2
+NOT_YOUR_TURN = 3
+BAD_SHOT = 4
+
+LENGTH = struct.Struct("<H")  # длина сообщения перед каждым сообщением
+
+
+class Protocol:
+    """
+    Упаковка и распаковка сообщений для поля заданного размера
+    """
+
+    def __init__(self, grid_size):
+        self.grid_size = grid_size
+        self.cell = "I" if is_wide(grid_size) else "H"  # 4 или 2 байта на клетку
+        self.orientation_bit = 1 << (struct.calcsize(self.cell) * 8 - 1)
+        self.cell_struct = struct.Struct("<" + self.cell)
+        self.placement_struct = struct.Struct("<" + self.cell + "B")
+        self.result_struct = struct.Struct("<BBB" + self.cell + "B")
+
+    def pack_placement(self, x, y, size, horizontal):
+        cell = y * self.grid_size + x
+        if horizontal:
+            cell |= self.orientation_bit
+        return self.placement_struct.pack(cell, size)
+
+    def unpack_placement(self, data, offset):
+        cell, size = self.placement_struct.unpack_from(data, offset)
+        horizontal = bool(cell & self.orientation_bit)
+        y, x = divmod(cell & (self.orientation_bit - 1), self.grid_size)
+        return x, y, size, horizontal
+
+    def place(self, placements):
+        parts = [struct.pack("<BH", PLACE, len(placements))]
+        parts += [self.pack_placement(*placement) for placement in placements]
+        return b"".join(parts)
+
+    def shot(self, x, y):
+        return bytes([SHOT]) + self.cell_struct.pack(y * self.grid_size + x)
+
+    def matched(self, index, ships):
+        parts = [struct.pack("<BHBB", MATCHED, self.grid_size, index, len(ships))]
+        parts += [struct.pack("<BH", size, count) for size, count in ships.items()]
+        return b"".join(parts)
+
+    def result(self, shooter, x, y, result, sunk=None):
+        """
+        shooter - 0: стрелял получатель, 1: его соперник
+        sunk - потопленный корабль (engine.Ship) или None
+        """
+        message = self.result_struct.pack(
+            RESULT, shooter, result, y * self.grid_size + x, sunk is not None
+        )
+        if sunk is not None:
+            message += self.pack_placement(sunk.x, sunk.y, sunk.size, sunk.horizontal)
+        return message
+
+    def decode(self, data):
+        """
+        Разбирает сообщение (кроме JOIN и MATCHED - см. decode_join/decode_matched)
+        Возвращает (тип, поля)
+        """
+        kind = data[0]
+        if kind == PLACE:
+            (count,) = struct.unpack_from("<H", data, 1)
+            size = self.placement_struct.size
+            if len(data) != 3 + count * size:
+                raise ValueError("длина PLACE не сходится")
+            return kind, [
+                self.unpack_placement(data, 3 + i * size) for i in range(count)
+            ]
+        if kind == SHOT:
+            (cell,) = self.cell_struct.unpack_from(data, 1)
+            y, x = divmod(cell, self.grid_size)
+            return kind, (x, y)
+        if kind == RESULT:
+            _, shooter, result, cell, sunk = self.result_struct.unpack_from(data)
+            y, x = divmod(cell, self.grid_size)
+            ship = None
+            if sunk:
+                ship = self.unpack_placement(data, self.result_struct.size)
+            return kind, (shooter, x, y, result, ship)
+        if kind in (START, GAME_OVER, ERROR):
+            return kind, data[1]
+        if kind == OPPONENT_LEFT:
+            return kind, None
+        raise ValueError(f"неизвестный тип сообщения {kind}")
+
+
+def join_message(grid_size):
+    return struct.pack("<BH", JOIN, grid_size)
+
+
+def decode_join(data):
+    return struct.unpack_from("<H", data, 1)[0]
+
+
+def decode_matched(data):
+    """
+    Возвращает (размер поля, номер игрока, флот {размер: количество})
+    """
+    _, grid_size, index, count = struct.unpack_from("<BHBB", data)
+    ships = {}
+    for i in range(count):
+        size, number = struct.unpack_from("<BH", data, 5 + i * 3)
+        ships[size] = number
+    return grid_size, index, ships
+
+
+def mark_shot(field, grid_size, x, y, result, sunk=None):
+    """
+    Отмечает на поле результат выстрела и промахи вокруг потопленного
+    корабля (sunk - расстановка (x, y, размер, горизонтально) или None)
+    """
+    field[y, x] = result
+    if sunk is not None:
+        for i, j in Ship(0, *sunk).halo(grid_size):
+            if field[j, i] not in (HIT, MISS):
+                field[j, i] = MISS
+
+
+async def read_message(reader):
+    (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+    return await reader.readexactly(length)
+
+
+def write_message(writer, message):
+    writer.write(LENGTH.pack(len(message)) + message)
+
+
+class Match:
+    """
+    Партия двух игроков на сервере: игрок 0 в движке - "игрок",
+    игрок 1 - "компьютер" (его выстрелы идут через computer_shot)
+    """
+
+    def __init__(self, server, players, grid_size, ships):
+        self.server = server
+        self.players = players
+        self.protocol = server.protocol(grid_size)
+        self.grid_size = grid_size
+        self.ships = ships
+        self.placements = [None, None]
+        # на очень больших полях храним только непустые клетки
+        self.field_type = "sparse" if is_wide(grid_size) else "array"
+        self.engine = None
+        self.finished = False
+        for index, player in enumerate(players):
+            player.match = self
+            player.index = index
+            player.send(self.protocol.matched(index, ships))
+
+    def place(self, player, placements):
+        if self.placements[player.index] is not None or not self.valid(placements):
+            player.send(bytes([ERROR, BAD_PLACEMENT]))
+            return
+        self.placements[player.index] = placements
+        if None in self.placements:
+            return
+        self.engine = BattleshipEngine(
+            self.grid_size,
+            self.ships,
+            seed=0,
+            field_type=self.field_type,
+            place_ships=False,
+        )
+        self.engine.start_with_fleets(*self.placements)
+        for index, other in enumerate(self.players):
+            other.send(bytes([START, index == 0]))
+
+    def valid(self, placements):
+        """
+        Флот тот же, что объявлен, и корабли стоят по правилам
+        """
+        if Counter(size for _, _, size, _ in placements) != Counter(self.ships):
+            return False
+        field = new_field(self.grid_size, self.field_type)
+        for x, y, size, horizontal in placements:
+            if not (0 <= x < self.grid_size and 0 <= y < self.grid_size):
+                return False
+            if not can_place_ship(field, x, y, size, horizontal):
+                return False
+            place_ship(field, x, y, size, horizontal)
+        return True
+
+    def shot(self, player, x, y):
+        engine = self.engine
+        if engine is None or engine.game_over:
+            player.send(bytes([ERROR, NOT_YOUR_TURN]))
+            return
+        if engine.is_player_turn != (player.index == 0):
+            player.send(bytes([ERROR, NOT_YOUR_TURN]))
+            return
+        if not (0 <= x < self.grid_size and 0 <= y < self.grid_size):
+            player.send(bytes([ERROR, BAD_SHOT]))
+            return
+        if player.index == 0:
+            result = engine.player_shot(x, y)
+        else:
+            result = engine.computer_shot(x, y)
+        if result is None:  # сюда уже стреляли
+            player.send(bytes([ERROR, BAD_SHOT]))
+            return
+        for other in self.players:
+            shooter = 0 if other is player else 1
+            other.send(self.protocol.result(shooter, x, y, result, engine.last_sunk))
+        if engine.game_over:
+            self.finished = True
+            for other in self.players:
+                other.send(bytes([GAME_OVER, other is player]))
+            self.server.finish(self)
+
+    def leave(self, player):
+        if not self.finished:
+            self.finished = True
+            for other in self.players:
+                if other is not player:
+                    other.send(bytes([OPPONENT_LEFT]))
+            self.server.finish(self)
+
+
+class Connection:
+    """
+    Подключенный к серверу клиент
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.match = None
+        self.index = None
+        self.grid_size = None
+
+    def send(self, message):
+        if not self.writer.is_closing():
+            write_message(self.writer, message)
+
+
+class MatchServer:
+    """
+    Сервер: подбирает соперников с одинаковым размером поля
+    и ведет их партии
+    """
+
+    def __init__(self, fill_ratio=0.25):
+        self.fill_ratio = fill_ratio
+        self.waiting = {}  # размер поля -> ждущий соперника клиент
+        self.matches = set()
+        self.finished_matches = 0
+        self.protocols = {}
+
+    def protocol(self, grid_size):
+        if grid_size not in self.protocols:
+            self.protocols[grid_size] = Protocol(grid_size)
+        return self.protocols[grid_size]
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        Запускает сервер, возвращает asyncio.Server (порт - в server.sockets)
+        """
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def handle(self, reader, writer):
+        connection = Connection(writer)
+        try:
+            while True:
+                data = await read_message(reader)
+                self.dispatch(connection, data)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except (ValueError, struct.error, IndexError):
+            connection.send(bytes([ERROR, BAD_MESSAGE]))
+        finally:
+            self.disconnect(connection)
+            writer.close()
+
+    def dispatch(self, connection, data):
+        kind = data[0]
+        if kind == JOIN:
+            if connection.grid_size is not None:
+                raise ValueError("повторный JOIN")
+            self.join(connection, decode_join(data))
+            return
+        match = connection.match
+        if match is None:
+            raise ValueError("сообщение до начала партии")
+        kind, fields = match.protocol.decode(data)
+        if kind == PLACE:
+            match.place(connection, fields)
+        elif kind == SHOT:
+            match.shot(connection, *fields)
+        else:
+            raise ValueError(f"клиент не может слать сообщение {kind}")
+
+    def join(self, connection, grid_size):
+        if not 2 <= grid_size <= 1000:
+            raise ValueError(f"размер поля {grid_size}")
+        connection.grid_size = grid_size
+        other = self.waiting.pop(grid_size, None)
+        if other is None:
+            self.waiting[grid_size] = connection
+            return
+        ships = calculate_ships_for_grid(grid_size, self.fill_ratio)
+        self.matches.add(Match(self, [other, connection], grid_size, ships))
+
+    def finish(self, match):
+        self.matches.discard(match)
+        self.finished_matches += 1
+
+    def disconnect(self, connection):
+        if self.waiting.get(connection.grid_size) is connection:
+            del self.waiting[connection.grid_size]
+        if connection.match is not None:
+            connection.match.leave(connection)
+
+
+class MatchClient:
+    """
+    Клиент: подключение к серверу и разбор его сообщений
+    """
+
+    def __init__(self, reader, writer, grid_size):
+        self.reader = reader
+        self.writer = writer
+        self.protocol = Protocol(grid_size)
+
+    @classmethod
+    async def connect(cls, host, port, grid_size):
+        reader, writer = await asyncio.open_connection(host, port)
+        client = cls(reader, writer, grid_size)
+        client.send(join_message(grid_size))
+        return client
+
+    def send(self, message):
+        write_message(self.writer, message)
+
+    def send_placements(self, placements):
+        self.send(self.protocol.place(placements))
+
+    def send_shot(self, x, y):
+        self.send(self.protocol.shot(x, y))
+
+    async def receive(self):
+        """
+        Следующее сообщение сервера: (тип, поля)
+        MATCHED приходит как (MATCHED, (номер игрока, флот))
+        """
+        data = await read_message(self.reader)
+        if data[0] == MATCHED:
+            _, index, ships = decode_matched(data)
+            return MATCHED, (index, ships)
+        return self.protocol.decode(data)
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def play_bot(host, port, grid_size=GRID_SIZE, difficulty="random", seed=None):
+    """
+    Бот: подключается, расставляет корабли случайно и стреляет стратегией
+    из ai.py, пока партия не кончится
+    Возвращает (победил ли, список задержек ответа на выстрел в секундах)
+    """
+    rng = random.Random(seed)
+    client = await MatchClient.connect(host, port, grid_size)
+    latencies = []
+    won = None
+    ai = None
+    visible = new_field(grid_size)
+    hits_left = None  # сколько клеток кораблей соперника осталось подбить
+    sent = None
+    try:
+        while won is None:
+            kind, fields = await client.receive()
+            if kind == MATCHED:
+                _, ships = fields
+                # как в движке: на больших полях без таблицы всех расстановок
+                if default_placement(grid_size) == "generator":
+                    placements = FleetGenerator(grid_size, ships).sample(rng)
+                else:
+                    placements = rejection_fleet(grid_size, ships, rng)
+                ai = make_ai(difficulty, grid_size, ships, rng)
+                hits_left = sum(size * count for size, count in ships.items())
+                client.send_placements(placements)
+            elif kind == START:
+                if fields:
+                    sent = time.perf_counter()
+                    client.send_shot(*ai.choose_shot())
+            elif kind == RESULT:
+                shooter, x, y, result, sunk = fields
+                if shooter == 0:
+                    latencies.append(time.perf_counter() - sent)
+                    mark_shot(visible, grid_size, x, y, result, sunk)
+                    ai.observe(x, y, result, None if sunk is None else Ship(0, *sunk))
+                    if result == HIT:
+                        hits_left -= 1
+                # после попадания стреляет тот же, после промаха - другой;
+                # если все корабли соперника подбиты, ждем GAME_OVER
+                my_turn = (shooter == 0) == (result == HIT)
+                if my_turn and hits_left > 0:
+                    sent = time.perf_counter()
+                    client.send_shot(*ai.choose_shot())
+            elif kind == GAME_OVER:
+                won = bool(fields)
+            elif kind == OPPONENT_LEFT:
+                won = True
+            elif kind == ERROR:
+                raise RuntimeError(f"сервер вернул ошибку {fields}")
+    finally:
+        await client.close()
+    return won, latencies
+
+
+class NetworkOpponent:
+    """
+    Соперник по сети для окна игры: клиент работает в фоновом потоке
+    со своим циклом asyncio и не мешает циклу отрисовки.
+    Сообщения сервера складываются в очередь messages, а окно будят
+    событием pygame event_type (если оно задано)
+    """
+
+    def __init__(self, host, port, grid_size, event_type=None):
+        self.grid_size = grid_size
+        self.protocol = Protocol(grid_size)
+        self.event_type = event_type
+        self.messages = queue.Queue()
+        self.loop = asyncio.new_event_loop()
+        self.client = None
+        self.thread = threading.Thread(target=self._run, args=(host, port), daemon=True)
+        self.thread.start()
+
+    def _run(self, host, port):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._receive_loop(host, port))
+
+    async def _receive_loop(self, host, port):
+        try:
+            self.client = await MatchClient.connect(host, port, self.grid_size)
+            while True:
+                self._deliver(await self.client.receive())
+        except (
+            OSError,
+            asyncio.IncompleteReadError,
+            ValueError,
+            struct.error,
+        ) as error:
+            # сервер недоступен, закрыл соединение или прислал ерунду -
+            # для окна это то же, что соперник ушел
+            self._deliver((OPPONENT_LEFT, str(error)))
+
+    def _deliver(self, message):
+        self.messages.put(message)
+        if self.event_type is not None:
+            import pygame
+
+            try:
+                pygame.event.post(pygame.event.Event(self.event_type))
+            except pygame.error:
+                pass  # окно уже закрыто - будить некого
+
+    def _send(self, message):
+        # писать в сокет можно только из потока цикла asyncio
+        if self.client is not None:
+            self.loop.call_soon_threadsafe(self.client.send, message)
+
+    def send_placements(self, placements):
+        self._send(self.protocol.place(placements))
+
+    def send_shot(self, x, y):
+        self._send(self.protocol.shot(x, y))
+
+    def poll(self):
+        """
+        Все пришедшие сообщения (не ждет)
+        """
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def close(self):
+        if self.client is not None:
+            self.loop.call_soon_threadsafe(self.client.writer.close)
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+async def load_test(matches, grid_size=GRID_SIZE, difficulty="random", seed=0):
+    """
+    Поднимает сервер на localhost и играет matches партий ботами одновременно
+    Возвращает словарь со статистикой
+    """
+    server = MatchServer()
+    tcp_server = await server.start("127.0.0.1", 0)
+    port = tcp_server.sockets[0].getsockname()[1]
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            play_bot("127.0.0.1", port, grid_size, difficulty, seed + i)
+            for i in range(2 * matches)
+        )
+    )
+    elapsed = time.perf_counter() - start
+    tcp_server.close()
+    await tcp_server.wait_closed()
+
+    latencies = sorted(latency for _, bot in results for latency in bot)
+    wins = sum(1 for won, _ in results if won)
+    return {
+        "matches": matches,
+        "finished": server.finished_matches,
+        "wins": wins,
+        "seconds": elapsed,
+        "moves": len(latencies),
+        "moves_per_sec": len(latencies) / elapsed,
+        "latency_p50_ms": percentile(latencies, 0.5) * 1000,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+        "latency_mean_ms": statistics.fmean(latencies) * 1000,
+    }
+
+
+async def serve(host, port):
+    server = MatchServer()
+    tcp_server = await server.start(host, port)
+    print(f"Сервер ждет игроков на {host}:{port}")
+    async with tcp_server:
+        await tcp_server.serve_forever()
+
+
+async def run_bots(host, port, games, grid_size, difficulty):
+    results = await asyncio.gather(
+        *(play_bot(host, port, grid_size, difficulty, i) for i in range(games))
+    )
+    wins = sum(1 for won, _ in results if won)
+    print(f"Ботов: {games}, побед: {wins}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Морской бой по сети")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    server = commands.add_parser("server", help="запустить сервер матчей")
+    server.add_argument("--host", default="127.0.0.1")
+    server.add_argument("--port", type=int, default=8765)
+
+    bot = commands.add_parser("bot", help="подключить ботов к серверу")
+    bot.add_argument("--host", default="127.0.0.1")
+    bot.add_argument("--port", type=int, default=8765)
+    bot.add_argument("--games", type=int, default=1, help="сколько ботов")
+    bot.add_argument("--grid-size", type=int, default=GRID_SIZE)
+    bot.add_argument("--difficulty", default="random")
+
+    load = commands.add_parser("load", help="нагрузочный тест на localhost")
+    load.add_argument("--matches", type=int, default=1000)
+    load.add_argument("--grid-size", type=int, default=GRID_SIZE)
+    load.add_argument("--difficulty", default="random")
+
+    args = parser.parse_args(argv)
+    if args.command == "server":
+        asyncio.run(serve(args.host, args.port))
+    elif args.command == "bot":
+        asyncio.run(
+            run_bots(args.host, args.port, args.games, args.grid_size, args.difficulty)
+        )
+    elif args.command == "load":
+        stats = asyncio.run(load_test(args.matches, args.grid_size, args.difficulty))
+        print(
+            f"Партий: {stats['finished']}/{stats['matches']} за "
+            f"{stats['seconds']:.2f} с, ходов: {stats['moves']} "
+            f"({stats['moves_per_sec']:.0f} в секунду)"
+        )
+        print(
+            f"Задержка ответа на выстрел: медиана {stats['latency_p50_ms']:.2f} мс, "
+            f"p99 {stats['latency_p99_ms']:.2f} мс, "
+            f"среднее {stats['latency_mean_ms']:.2f} мс"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,474 @@
+"""
+Быстрая случайная расстановка флота без бесконечных циклов.
+
+Вместо того чтобы тыкать в случайные клетки, пока корабль не встанет,
+генератор держит список всех еще возможных расстановок (x, y, ориентация)
+для каждого размера корабля. Очередной корабль выбирается из этого списка
+равновероятно, а после установки из списков убираются только те расстановки,
+которые задевают новый корабль или его ореол. Если для какого-то размера
+места не осталось, генератор откатывает последние корабли и пробует другие
+варианты, так что расстановка всегда заканчивается. Невозможный флот
+определяется сразу при создании генератора.
+"""
+
+import random
+
+from tables import cached_table
+
+
+class ImpossibleFleetError(ValueError):
+    """
+    Флот нельзя расставить на поле такого размера
+    """
+
+
+class PlacementTable:
+    """
+    Все расстановки кораблей заданных размеров на поле grid_size x grid_size
+    Номер расстановки - индекс в списке placements, а для каждой клетки
+    известно, какие расстановки ее занимают (обратный индекс)
+    """
+
+    def __init__(self, grid_size, sizes):
+        self.grid_size = grid_size
+        self.placements = []  # (x, y, размер, горизонтально)
+        self.cells = []  # номера клеток корабля (y * размер поля + x)
+        self.zones = []  # номера клеток корабля вместе с ореолом
+        self.by_size = {}  # размер -> номера расстановок
+        # клетка -> номера расстановок, у которых в этой клетке корабль
+        self.covering = [[] for _ in range(grid_size * grid_size)]
+
+        # поле делится на квадраты 2x2: все клетки квадрата касаются друг
+        # друга, поэтому в квадрате могут быть клетки только одного корабля,
+        # а корабль размера s задевает хотя бы (s + 1) // 2 квадратов.
+        # Это позволяет быстро понять, что оставшиеся корабли уже не влезут
+        half = (grid_size + 1) // 2
+        self.num_squares = half * half
+        self.square_of = [
+            (cell // grid_size // 2) * half + cell % grid_size // 2
+            for cell in range(grid_size * grid_size)
+        ]
+
+        for size in sorted(set(sizes), reverse=True):
+            ids = self.by_size[size] = []
+            # однопалубный корабль одинаков в обеих ориентациях
+            orientations = (True,) if size == 1 else (True, False)
+            for horizontal in orientations:
+                width, height = (size, 1) if horizontal else (1, size)
+                for y in range(grid_size - height + 1):
+                    for x in range(grid_size - width + 1):
+                        self._add(len(self.placements), x, y, width, height)
+                        self.placements.append((x, y, size, horizontal))
+                        ids.append(len(self.placements) - 1)
+
+    def _add(self, placement_id, x, y, width, height):
+        grid_size = self.grid_size
+        cells = tuple(
+            j * grid_size + i for j in range(y, y + height) for i in range(x, x + width)
+        )
+        zone = tuple(
+            j * grid_size + i
+            for j in range(max(0, y - 1), min(grid_size, y + height + 1))
+            for i in range(max(0, x - 1), min(grid_size, x + width + 1))
+        )
+        self.cells.append(cells)
+        self.zones.append(zone)
+        for cell in cells:
+            self.covering[cell].append(placement_id)
+
+
+def placement_table(grid_size, sizes):
+    """
+    Таблица расстановок для поля и набора размеров (sizes - кортеж)
+    Таблица не меняется, поэтому строится один раз на конфигурацию
+    и хранится в кэше таблиц (tables.py)
+    """
+    return cached_table("placements", PlacementTable, grid_size, sizes)
+
+
+class FleetGenerator:
+    """
+    Генератор случайных расстановок флота ships ({размер: количество})
+
+    Каждый корабль выбирается равновероятно среди расстановок, которые еще
+    возможны после предыдущих кораблей. Корабли ставятся от больших к малым.
+    """
+
+    def __init__(self, grid_size, ships):
+        self.grid_size = grid_size
+        self.ships = dict(ships)
+        # порядок расстановки: сначала большие корабли, им труднее найти место
+        self.order = [
+            size
+            for size in sorted(self.ships, reverse=True)
+            for _ in range(self.ships[size])
+        ]
+        self.table = placement_table(grid_size, tuple(sorted(self.ships)))
+        check_fleet(grid_size, tuple(sorted(self.ships.items())))
+
+        # живые (еще возможные) расстановки для каждого размера:
+        # список номеров + позиция каждого номера в списке (-1 - вычеркнута),
+        # чтобы и выбор, и удаление работали за O(1)
+        self.alive = {size: list(ids) for size, ids in self.table.by_size.items()}
+        self.position = [-1] * len(self.table.placements)
+        for ids in self.alive.values():
+            for index, placement_id in enumerate(ids):
+                self.position[placement_id] = index
+
+        # для отсечения по квадратам 2x2 (см. PlacementTable):
+        # сколько ореолов накрывает клетку, сколько в квадрате свободных
+        # клеток и сколько квадратов еще не занято целиком
+        cells = grid_size * grid_size
+        self.zone_count = [0] * cells
+        self.square_free = [0] * self.table.num_squares
+        for cell in range(cells):
+            self.square_free[self.table.square_of[cell]] += 1
+        self.free_squares = self.table.num_squares
+        # сколько квадратов нужно кораблям начиная с k-го
+        self.need = squares_needed(self.order)
+
+    def sample(self, rng=random):
+        """
+        Одна случайная расстановка флота
+        Возвращает список (x, y, размер, горизонтально)
+        """
+        # обычно корабли встают с первой попытки; если перебор затянулся
+        # (плотный флот), пробуем начать заново с другими случайными кораблями
+        for _ in range(3):
+            chosen = self._sample_once(rng, 64 * len(self.order), False)
+            if chosen is not None:
+                break
+        else:
+            # очень плотный флот: случайные попытки почти никогда не удаются.
+            # Делаем полный перебор в порядке таблицы (сверху вниз, как
+            # в check_fleet - так корабли укладываются плотно и перебор
+            # быстрый), одинаковые корабли ставим по возрастанию номеров, чтобы
+            # не перебирать их перестановки. Перебор конечен, а флот проверен
+            # в __init__, поэтому расстановка всегда находится. Разнообразия
+            # добавляем случайным поворотом/отражением всего поля
+            chosen = self._sample_once(rng, None, True)
+            symmetry = rng.randrange(8)
+            return [
+                transform_placement(self.table.placements[p], self.grid_size, symmetry)
+                for p in chosen
+            ]
+        placements = self.table.placements
+        return [placements[placement_id] for placement_id in chosen]
+
+    def _sample_once(self, rng, budget, exhaustive):
+        """
+        Одна попытка расстановки: список номеров расстановок или None,
+        если перебор не уложился в budget шагов
+        exhaustive - перебирать расстановки по порядку, а не случайно
+        """
+        chosen = []
+        # вычеркнутые расстановки и их места в списках, чтобы потом вернуть
+        # их обратно ровно туда же: тогда следующая расстановка зависит
+        # только от rng, а не от того, что генератор выдавал раньше
+        removed = []
+        self._budget = budget
+        self._exhaustive = exhaustive
+        try:
+            found = self._fill(rng, chosen, removed)
+        except _Restart:
+            found = False
+        for placement_id in chosen:
+            self._release(placement_id)
+        self._restore(removed, 0)
+        return chosen if found else None
+
+    def __iter__(self):
+        """
+        Бесконечный поток случайных расстановок (зерно 0 для повторяемости)
+        """
+        return self.iter_fleets()
+
+    def iter_fleets(self, count=None, seed=0):
+        """
+        Выдает count случайных расстановок (или бесконечно, если count=None)
+        """
+        rng = random.Random(seed)
+        produced = 0
+        while count is None or produced < count:
+            yield self.sample(rng)
+            produced += 1
+
+    def _fill(self, rng, chosen, removed):
+        """
+        Ставит все корабли по порядку, откатываясь при неудаче
+        Перебор идет в цикле со своим стеком, а не рекурсией: на больших
+        полях кораблей тысячи, а глубина рекурсии в Python ограничена
+        Возвращает False, если флот так и не встал
+        """
+        # для каждого корабля, который стоит или ставится: (варианты,
+        # сколько расстановок было вычеркнуто до него)
+        stack = []
+        while True:
+            k = len(chosen)
+            if k == len(self.order):
+                return True
+            candidates = self._candidates(k, rng, chosen)
+            if candidates is not None:
+                stack.append((candidates, len(removed)))
+            # следующий вариант для последнего корабля, у которого они остались
+            while stack:
+                candidates, mark = stack[-1]
+                if len(chosen) == len(stack):
+                    # прошлый вариант этого корабля не подошел - убираем его
+                    self._release(chosen.pop())
+                    self._restore(removed, mark)
+                placement_id = next(candidates, None)
+                if placement_id is not None:
+                    self._block(placement_id, removed)
+                    self._occupy(placement_id)
+                    chosen.append(placement_id)
+                    break
+                stack.pop()
+            else:
+                return False
+
+    def _candidates(self, k, rng, chosen):
+        """
+        Варианты для k-го корабля (итератор номеров расстановок) или None,
+        если при уже поставленных кораблях остальные не влезут
+        """
+        alive = self.alive[self.order[k]]
+        if not alive or self.free_squares < self.need[k]:
+            return None
+        if self._exhaustive:
+            # полный перебор для плотных флотов (см. sample)
+            if k > 0 and self.order[k - 1] == self.order[k]:
+                return iter(sorted(p for p in alive if p > chosen[-1]))
+            return iter(sorted(alive))
+        if self._budget is not None:
+            self._budget -= 1
+            if self._budget < 0:
+                raise _Restart
+        return self._random_candidates(alive, rng)
+
+    @staticmethod
+    def _random_candidates(alive, rng):
+        # обычно хватает одной случайной попытки
+        first = alive[int(rng.random() * len(alive))]
+        yield first
+        # не вышло - перебираем остальные варианты в случайном порядке
+        # (alive к этому моменту уже откачен к состоянию до first)
+        rest = [placement_id for placement_id in alive if placement_id != first]
+        rng.shuffle(rest)
+        yield from rest
+
+    def _occupy(self, placement_id):
+        """
+        Отмечает ореол поставленного корабля для отсечения по квадратам
+        """
+        square_of = self.table.square_of
+        for cell in self.table.zones[placement_id]:
+            self.zone_count[cell] += 1
+            if self.zone_count[cell] == 1:
+                square = square_of[cell]
+                self.square_free[square] -= 1
+                if self.square_free[square] == 0:
+                    self.free_squares -= 1
+
+    def _release(self, placement_id):
+        """
+        Обратное к _occupy
+        """
+        square_of = self.table.square_of
+        for cell in self.table.zones[placement_id]:
+            self.zone_count[cell] -= 1
+            if self.zone_count[cell] == 0:
+                square = square_of[cell]
+                self.square_free[square] += 1
+                if self.square_free[square] == 1:
+                    self.free_squares += 1
+
+    def _block(self, placement_id, removed):
+        """
+        Вычеркивает все расстановки, которые задевают корабль placement_id
+        или его ореол (в том числе и саму placement_id)
+        """
+        table = self.table
+        position = self.position
+        for cell in table.zones[placement_id]:
+            for other in table.covering[cell]:
+                if position[other] >= 0:
+                    removed.append((other, self._remove(other)))
+
+    def _remove(self, placement_id):
+        # меняем местами с последним элементом и укорачиваем список
+        # Возвращает, на каком месте в списке была расстановка
+        ids = self.alive[self.table.placements[placement_id][2]]
+        index = self.position[placement_id]
+        last = ids.pop()
+        if last != placement_id:
+            ids[index] = last
+            self.position[last] = index
+        self.position[placement_id] = -1
+        return index
+
+    def _restore(self, removed, mark):
+        """
+        Возвращает расстановки, вычеркнутые после отметки mark,
+        на их прежние места (обратное к _remove, в обратном порядке)
+        """
+        placements = self.table.placements
+        position = self.position
+        for placement_id, index in reversed(removed[mark:]):
+            ids = self.alive[placements[placement_id][2]]
+            if index < len(ids):
+                # на ее место был перенесен последний элемент - возвращаем его в конец
+                moved = ids[index]
+                position[moved] = len(ids)
+                ids.append(moved)
+                ids[index] = placement_id
+            else:
+                ids.append(placement_id)
+            position[placement_id] = index
+        del removed[mark:]
+
+
+def transform_placement(placement, grid_size, symmetry):
+    """
+    Поворачивает/отражает расстановку (x, y, размер, горизонтально)
+    symmetry - номер одной из 8 симметрий квадратного поля (0 - без изменений)
+    """
+    x, y, size, horizontal = placement
+    last = grid_size - 1
+    x_end, y_end = (x + size - 1, y) if horizontal else (x, y + size - 1)
+    corners = []
+    for cx, cy in ((x, y), (x_end, y_end)):
+        if symmetry & 1:  # отражение слева направо
+            cx = last - cx
+        if symmetry & 2:  # отражение сверху вниз
+            cy = last - cy
+        if symmetry & 4:  # отражение относительно диагонали
+            cx, cy = cy, cx
+        corners.append((cx, cy))
+    (x0, y0), (x1, y1) = corners
+    return min(x0, x1), min(y0, y1), size, y0 == y1
+
+
+class _Restart(Exception):
+    """
+    Перебор в FleetGenerator исчерпал свой бюджет шагов
+    """
+
+
+def squares_needed(order):
+    """
+    Сколько квадратов 2x2 нужно кораблям order[k:] для каждого k
+    """
+    need = [0] * (len(order) + 1)
+    for k in range(len(order) - 1, -1, -1):
+        need[k] = need[k + 1] + (order[k] + 1) // 2
+    return need
+
+
+def check_fleet(grid_size, ships):
+    """
+    Проверяет, что флот ships (кортеж пар (размер, количество)) вообще
+    можно расставить, иначе бросает ImpossibleFleetError
+    Перебор бывает долгим, поэтому удачная проверка запоминается (tables.py)
+    """
+    return cached_table("fleet", _check_fleet, grid_size, ships)
+
+
+def _check_fleet(grid_size, ships):
+    ships = dict(ships)
+    if not ships or min(ships) < 1 or max(ships) > grid_size:
+        raise ImpossibleFleetError(
+            f"Корабли {ships} не помещаются на поле {grid_size}x{grid_size}"
+        )
+    # быстрая оценка площади: если раздуть каждый корабль на полклетки во все
+    # стороны, прямоугольники (размер + 1) x 2 не пересекаются и лежат
+    # в квадрате (grid_size + 1) x (grid_size + 1)
+    area = sum((size + 1) * 2 * count for size, count in ships.items())
+    if area > (grid_size + 1) ** 2:
+        raise ImpossibleFleetError(
+            f"Корабли {ships} не помещаются на поле {grid_size}x{grid_size}"
+        )
+    # точная проверка - ищем хоть одну расстановку перебором
+    # (одинаковые корабли ставим в порядке возрастания номеров, чтобы
+    # не перебирать их перестановки)
+    table = placement_table(grid_size, tuple(sorted(ships)))
+    order = [size for size in sorted(ships, reverse=True) for _ in range(ships[size])]
+    blocked = [0] * len(table.placements)  # сколько поставленных кораблей мешает
+    zone_count = [0] * (grid_size * grid_size)  # сколько ореолов накрывает клетку
+
+    # отсечение по квадратам 2x2 (см. PlacementTable): сколько в квадрате
+    # клеток вне ореолов и сколько квадратов еще не занято целиком
+    square_of = table.square_of
+    square_free = [0] * table.num_squares
+    for square in square_of:
+        square_free[square] += 1
+    free_squares = table.num_squares
+    need = squares_needed(order)
+
+    def put(placement_id):
+        nonlocal free_squares
+        zone = table.zones[placement_id]
+        touched = {other for cell in zone for other in table.covering[cell]}
+        for other in touched:
+            blocked[other] += 1
+        for cell in zone:
+            zone_count[cell] += 1
+            if zone_count[cell] == 1:
+                square_free[square_of[cell]] -= 1
+                if square_free[square_of[cell]] == 0:
+                    free_squares -= 1
+        return placement_id, touched
+
+    def take_back(placed):
+        nonlocal free_squares
+        placement_id, touched = placed
+        for other in touched:
+            blocked[other] -= 1
+        for cell in table.zones[placement_id]:
+            zone_count[cell] -= 1
+            if zone_count[cell] == 0:
+                square_free[square_of[cell]] += 1
+                if square_free[square_of[cell]] == 1:
+                    free_squares += 1
+
+    def candidates(k, start):
+        # расстановки k-го корабля, которым не мешают уже поставленные
+        size = order[k]
+        same_as_previous = k > 0 and order[k - 1] == size
+        for placement_id in table.by_size[size]:
+            if (same_as_previous and placement_id <= start) or blocked[placement_id]:
+                continue
+            yield placement_id
+
+    # перебор в цикле со своим стеком (как FleetGenerator._fill): рекурсия
+    # на тысячах кораблей уперлась бы в предел глубины Python
+    placed = []  # (номер расстановки, задетые ею расстановки) по кораблям
+    stack = []  # варианты для каждого поставленного или ставящегося корабля
+    while len(placed) < len(order):
+        k = len(placed)
+        if free_squares >= need[k]:
+            stack.append(candidates(k, placed[-1][0] if placed else -1))
+        while stack:
+            if len(placed) == len(stack):
+                take_back(placed.pop())
+            placement_id = next(stack[-1], None)
+            if placement_id is not None:
+                placed.append(put(placement_id))
+                break
+            stack.pop()
+        else:
+            break
+
+    if len(placed) < len(order):
+        raise ImpossibleFleetError(
+            f"Корабли {ships} не помещаются на поле {grid_size}x{grid_size}"
+        )
+    return True
+
+
+def random_fleet(grid_size, ships, rng=random):
+    """
+    Одна случайная расстановка флота (x, y, размер, горизонтально)
+    Для многих расстановок подряд выгоднее создать FleetGenerator один раз
+    """
+    return FleetGenerator(grid_size, ships).sample(rng)
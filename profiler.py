@@ -0,0 +1,188 @@
+"""
+Замеры времени по кадрам прямо во время игры.
+
+FrameProfiler запоминает, сколько времени в каждом кадре заняли части
+игрового цикла (обработка событий, ход компьютера, рисование...) и сколько
+раз они вызывались. Хранятся последние window кадров, их можно сохранить
+в файл (по строке JSON на кадр) и разобрать потом.
+
+Пока профилировщик выключен, section() возвращает один и тот же пустой
+контекст, так что замеры почти ничего не стоят.
+
+ProfilerOverlay рисует поверх окна FPS и разбивку времени кадра.
+"""
+
+import json
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import pygame
+
+from renderer import BLACK, WHITE
+
+# пустой контекст для выключенного профилировщика (создается один раз)
+NO_SECTION = nullcontext()
+
+# части кадра, которые не считаются работой (цикл спит в ожидании событий)
+IDLE_SECTIONS = ("wait",)
+
+
+class _Section:
+    """
+    Замер одной части кадра: with profiler.section("draw"): ...
+    """
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class FrameProfiler:
+    """
+    Время и число вызовов частей кадра за последние window кадров
+    """
+
+    def __init__(self, enabled=False, window=600):
+        """
+        enabled - сразу начинать замеры
+        window - сколько последних кадров хранить
+        """
+        self.enabled = enabled
+        self.samples = deque(maxlen=window)  # готовые кадры
+        self.frame = {}  # текущий кадр: часть -> [секунды, вызовы]
+        self.frame_start = None
+        self.frame_number = 0
+
+    def section(self, name):
+        """
+        Контекст для замера части кадра
+        """
+        if not self.enabled:
+            return NO_SECTION
+        return _Section(self, name)
+
+    def add(self, name, seconds, calls=1):
+        """
+        Добавляет время к части текущего кадра (например, время, которое
+        компьютер думал в другом потоке)
+        """
+        if not self.enabled:
+            return
+        entry = self.frame.get(name)
+        if entry is None:
+            self.frame[name] = [seconds, calls]
+        else:
+            entry[0] += seconds
+            entry[1] += calls
+
+    def begin_frame(self):
+        if self.enabled:
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        """
+        Заканчивает кадр и откладывает его замеры в историю
+        """
+        if not self.enabled or self.frame_start is None:
+            return
+        now = time.perf_counter()
+        self.samples.append(
+            {
+                "frame": self.frame_number,
+                "time": now,
+                "duration": now - self.frame_start,
+                "sections": self.frame,
+            }
+        )
+        self.frame_number += 1
+        self.frame = {}
+        self.frame_start = None
+
+    def summary(self, frames=60):
+        """
+        Средние по последним frames кадрам:
+        (кадров в секунду, время работы в кадре, {часть: (секунды, вызовы)})
+        """
+        recent = list(self.samples)[-frames:]
+        if not recent:
+            return 0.0, 0.0, {}
+        total = {}
+        for sample in recent:
+            for name, (seconds, calls) in sample["sections"].items():
+                entry = total.setdefault(name, [0.0, 0])
+                entry[0] += seconds
+                entry[1] += calls
+        count = len(recent)
+        sections = {
+            name: (seconds / count, calls / count)
+            for name, (seconds, calls) in total.items()
+        }
+        span = recent[-1]["time"] - recent[0]["time"]
+        fps = (count - 1) / span if count > 1 and span > 0 else 0.0
+        busy = sum(
+            seconds
+            for name, (seconds, _) in sections.items()
+            if name not in IDLE_SECTIONS
+        )
+        return fps, busy, sections
+
+    def dump(self, path):
+        """
+        Сохраняет историю кадров в файл, по строке JSON на кадр
+        Возвращает число сохраненных кадров
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            for sample in self.samples:
+                file.write(json.dumps(sample) + "\n")
+        return len(self.samples)
+
+
+class ProfilerOverlay:
+    """
+    Табличка с FPS и временем частей кадра в левом верхнем углу окна
+    """
+
+    def __init__(self, profiler, position=(5, 5)):
+        self.profiler = profiler
+        self.position = position
+        self.font = pygame.font.Font(None, 20)
+        self.visible = False
+        self.rect = None  # где табличка нарисована сейчас
+
+    def lines(self):
+        fps, busy, sections = self.profiler.summary()
+        lines = [f"FPS {fps:5.1f}   кадр {busy * 1000:6.2f} мс"]
+        for name, (seconds, calls) in sorted(
+            sections.items(), key=lambda item: -item[1][0]
+        ):
+            lines.append(f"{name:<16}{seconds * 1000:7.2f} мс  x{calls:.1f}")
+        return lines
+
+    def draw(self, screen):
+        """
+        Рисует табличку, возвращает ее прямоугольник
+        """
+        surfaces = [self.font.render(line, True, WHITE) for line in self.lines()]
+        width = max(surface.get_width() for surface in surfaces) + 10
+        height = sum(surface.get_height() for surface in surfaces) + 10
+        panel = pygame.Surface((width, height))
+        panel.set_alpha(200)
+        panel.fill(BLACK)
+        screen.blit(panel, self.position)
+        x, y = self.position[0] + 5, self.position[1] + 5
+        for surface in surfaces:
+            screen.blit(surface, (x, y))
+            y += surface.get_height()
+        self.rect = pygame.Rect(self.position, (width, height))
+        return self.rect
@@ -0,0 +1,448 @@
+"""
+Запись партий в компактный двоичный файл и их воспроизведение.
+
+Файл только дописывается: заголовок файла, а за ним партии одна за другой.
+Партия - это заголовок фиксированного размера, расстановки кораблей
+игрока и компьютера и все выстрелы по порядку:
+- расстановка: клетка y * размер + x (старший бит - корабль стоит
+  горизонтально) и размер корабля в одном байте
+- выстрел: клетка и результат в двух младших битах (MISS = 2, HIT = 3)
+Кто стрелял, не записывается: это видно по правилам (первым стреляет игрок,
+после промаха ход переходит). На полях до 128x128 клетка занимает 2 байта,
+на полях больше - 4.
+
+GameLog открывает файл через mmap и читает партии лениво: пока не
+попросили расстановки или выстрелы, читается только заголовок партии.
+replay() восстанавливает состояние партии после любого числа выстрелов,
+show() проигрывает партию в окне игры с ускорением.
+
+Примеры:
+    python record.py simulate games.bin --games 100000
+    python record.py stats games.bin
+    python record.py show games.bin 42 --speed 20
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from engine import (
+    GRID_SIZE,
+    MISS,
+    BattleshipEngine,
+    simulate_game,
+)
+
+MAGIC = b"SWAR"
+VERSION = 1
+# заголовок файла: метка, версия, запас
+FILE_HEADER = struct.Struct("<4sHH")
+# заголовок партии: размер поля, кораблей у игрока, кораблей у компьютера,
+# выстрелов, флаги
+GAME_HEADER = struct.Struct("<HHHIB")
+
+WIDE = 1  # флаг: клетки записаны по 4 байта
+FINISHED = 2  # флаг: партия доиграна до конца
+
+SIZE_BYTES = 1  # размер корабля в расстановке
+
+
+def is_wide(grid_size):
+    """
+    Нужно ли 4 байта на клетку (в 2 байтах помещается 14 бит номера клетки)
+    """
+    return grid_size * grid_size > 1 << 14
+
+
+def cell_dtype(wide):
+    return np.dtype("<u4") if wide else np.dtype("<u2")
+
+
+def encode_game(engine):
+    """
+    Партия движка в виде байтов для записи в файл
+    """
+    grid_size = engine.grid_size
+    wide = is_wide(grid_size)
+    dtype = cell_dtype(wide)
+    orientation_bit = 1 << (dtype.itemsize * 8 - 1)
+
+    parts = []
+    fleets = (engine.player_fleet, engine.computer_fleet)
+    for fleet in fleets:
+        cells = np.array(
+            [
+                ship.y * grid_size
+                + ship.x
+                + (orientation_bit if ship.horizontal else 0)
+                for ship in fleet.ships
+            ],
+            dtype=dtype,
+        )
+        sizes = np.array([ship.size for ship in fleet.ships], dtype=np.uint8)
+        parts += [cells.tobytes(), sizes.tobytes()]
+
+    shots = np.array(
+        [(y * grid_size + x) << 2 | result for x, y, result in engine.shot_log],
+        dtype=dtype,
+    )
+    parts.append(shots.tobytes())
+
+    flags = (WIDE if wide else 0) | (FINISHED if engine.game_over else 0)
+    header = GAME_HEADER.pack(
+        grid_size,
+        len(engine.player_fleet.ships),
+        len(engine.computer_fleet.ships),
+        len(engine.shot_log),
+        flags,
+    )
+    return header + b"".join(parts)
+
+
+class GameRecorder:
+    """
+    Дописывает партии в файл
+    """
+
+    def __init__(self, path):
+        self.path = path
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab")
+        if new:
+            self.file.write(FILE_HEADER.pack(MAGIC, VERSION, 0))
+
+    def write_game(self, engine):
+        """
+        Записывает партию одним куском (недописанных партий в файле не бывает,
+        если только программу не убили посреди записи)
+        """
+        self.file.write(encode_game(engine))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+class GameRecord:
+    """
+    Одна партия из файла; расстановки и выстрелы читаются только по запросу
+    """
+
+    def __init__(self, buffer, offset):
+        self.buffer = buffer
+        self.offset = offset
+        (
+            self.grid_size,
+            self.player_ship_count,
+            self.computer_ship_count,
+            self.shot_count,
+            flags,
+        ) = GAME_HEADER.unpack_from(buffer, offset)
+        self.finished = bool(flags & FINISHED)
+        self.dtype = cell_dtype(flags & WIDE)
+        cell_bytes = self.dtype.itemsize
+        ships = self.player_ship_count + self.computer_ship_count
+        self.size = (
+            GAME_HEADER.size
+            + ships * (cell_bytes + SIZE_BYTES)
+            + self.shot_count * cell_bytes
+        )
+
+    def _array(self, offset, count, dtype):
+        return np.frombuffer(self.buffer, dtype=dtype, count=count, offset=offset)
+
+    def _placements(self, offset, count):
+        cells = self._array(offset, count, self.dtype)
+        sizes = self._array(offset + count * self.dtype.itemsize, count, np.uint8)
+        orientation_bit = 1 << (self.dtype.itemsize * 8 - 1)
+        horizontal = (cells & orientation_bit) != 0
+        cells = cells & (orientation_bit - 1)
+        ys, xs = np.divmod(cells, self.grid_size)
+        return [
+            (x, y, size, h)
+            for x, y, size, h in zip(
+                xs.tolist(), ys.tolist(), sizes.tolist(), horizontal.tolist()
+            )
+        ]
+
+    @property
+    def player_placements(self):
+        return self._placements(self.offset + GAME_HEADER.size, self.player_ship_count)
+
+    @property
+    def computer_placements(self):
+        offset = self.offset + GAME_HEADER.size
+        offset += self.player_ship_count * (self.dtype.itemsize + SIZE_BYTES)
+        return self._placements(offset, self.computer_ship_count)
+
+    @property
+    def shots(self):
+        """
+        Массив выстрелов: клетка << 2 | результат (без копирования из файла)
+        """
+        offset = self.offset + self.size - self.shot_count * self.dtype.itemsize
+        return self._array(offset, self.shot_count, self.dtype)
+
+    def shot_list(self):
+        """
+        Выстрелы списком (x, y, результат)
+        """
+        shots = self.shots
+        ys, xs = np.divmod(shots >> 2, self.grid_size)
+        results = shots & 3
+        return list(zip(xs.tolist(), ys.tolist(), results.tolist()))
+
+    @property
+    def ships(self):
+        """
+        Флот {размер: количество} (одинаковый у обоих)
+        """
+        return dict(Counter(size for _, _, size, _ in self.computer_placements))
+
+    def winner(self):
+        """
+        "player", "computer" или None, если партия не доиграна
+        Партию выигрывает тот, кто сделал последний выстрел
+        """
+        if not self.finished:
+            return None
+        return "player" if self.shooters()[-1] == 0 else "computer"
+
+    def shooters(self):
+        """
+        Кто сделал каждый выстрел: 0 - игрок, 1 - компьютер
+        После промаха (MISS) ход переходит к другому
+        """
+        misses = (self.shots & 3) == MISS
+        # номер стрелка - сколько промахов было до этого выстрела, по модулю 2
+        passed = np.concatenate(([0], np.cumsum(misses[:-1])))
+        return (passed % 2).astype(np.int8)
+
+
+def restore_engine(record, engine=None, field_type="array"):
+    """
+    Ставит на поля расстановки из записи и начинает игру
+    engine - движок (или окно игры) того же размера поля; по умолчанию
+    создается новый BattleshipEngine с полями вида field_type
+    Возвращает движок, готовый к выстрелам
+    """
+    if engine is None:
+        engine = BattleshipEngine(
+            record.grid_size, record.ships, field_type=field_type, place_ships=False
+        )
+    # прошлая партия (если движок уже играл) стирается, корабли - из записи
+    engine.start_with_fleets(record.player_placements, record.computer_placements)
+    return engine
+
+
+def apply_shot(engine, x, y):
+    """
+    Делает записанный выстрел за того, чей сейчас ход
+    """
+    if engine.is_player_turn:
+        return engine.player_shot(x, y)
+    return engine.computer_shot(x, y)
+
+
+def replay(record, shots=None, field_type="array"):
+    """
+    Состояние партии после первых shots выстрелов (по умолчанию - всех)
+    Возвращает движок
+    """
+    engine = restore_engine(record, field_type=field_type)
+    for x, y, result in record.shot_list()[:shots]:
+        if apply_shot(engine, x, y) != result:
+            raise ValueError(f"Запись партии не сходится с правилами на ({x}, {y})")
+    return engine
+
+
+class GameLog:
+    """
+    Файл с партиями, открытый через mmap
+    Партии можно перебирать (for record in log) и брать по номеру (log[i]);
+    номера находятся при первом обращении по номеру
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _ = FILE_HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: это не файл партий (или другая версия)")
+        self.offsets = None
+
+    def __iter__(self):
+        offset = FILE_HEADER.size
+        end = len(self.buffer)
+        while offset + GAME_HEADER.size <= end:
+            record = GameRecord(self.buffer, offset)
+            if offset + record.size > end:  # последняя партия дописана не до конца
+                break
+            yield record
+            offset += record.size
+
+    def _index(self):
+        if self.offsets is None:
+            self.offsets = [record.offset for record in self]
+        return self.offsets
+
+    def __len__(self):
+        return len(self._index())
+
+    def __getitem__(self, index):
+        return GameRecord(self.buffer, self._index()[index])
+
+    def close(self):
+        try:
+            self.buffer.close()
+        except BufferError:
+            pass  # на файл еще смотрят массивы выстрелов - закроется сам
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def show(record, speed=10.0, fps=60):
+    """
+    Проигрывает партию в окне игры: speed выстрелов в секунду
+    Закрыть окно можно крестиком, пробел - пауза
+    """
+    import pygame
+
+    from main import BattleshipGame
+
+    game = BattleshipGame(record.grid_size, record.ships, computer_delay=0)
+    restore_engine(record, game)
+    clock = pygame.time.Clock()
+    shots = record.shot_list()
+    played = 0.0
+    paused = False
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                paused = not paused
+            elif event.type == pygame.KEYDOWN:
+                game.handle_key(event.key)
+            elif event.type == pygame.MOUSEWHEEL:
+                game.handle_wheel(event.y)
+        if not paused:
+            # за кадр может пройти и несколько выстрелов
+            target = min(len(shots), played + speed / fps)
+            for x, y, _ in shots[int(played) : int(target)]:
+                apply_shot(game, x, y)
+            played = target
+        game.draw_frame()
+        clock.tick(fps)
+    pygame.quit()
+
+
+def print_stats(log):
+    """
+    Сводка по файлу: сколько партий, кто выигрывает, длина партий
+    """
+    start = time.perf_counter()
+    games = 0
+    winners = Counter()
+    lengths = []
+    for record in log:
+        games += 1
+        winners[record.winner()] += 1
+        lengths.append(record.shot_count)
+    elapsed = time.perf_counter() - start
+    print(f"Партий: {games} (прочитано за {elapsed:.2f} с)")
+    if not games:
+        return
+    print(
+        f"Победы игрока: {winners['player']}, компьютера: {winners['computer']}, "
+        f"не доиграно: {winners[None]}"
+    )
+    lengths.sort()
+    print(
+        f"Выстрелов за партию: мин {lengths[0]}, медиана {lengths[games // 2]}, "
+        f"макс {lengths[-1]}"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Запись и просмотр партий")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    simulate = commands.add_parser("simulate", help="сыграть и записать партии")
+    simulate.add_argument("path")
+    simulate.add_argument("--games", type=int, default=1000)
+    simulate.add_argument("--grid-size", type=int, default=GRID_SIZE)
+    simulate.add_argument("--seed", type=int, default=0)
+    simulate.add_argument("--difficulty", default="random")
+
+    stats = commands.add_parser("stats", help="сводка по файлу партий")
+    stats.add_argument("path")
+
+    replay_command = commands.add_parser("replay", help="проверить партию без окна")
+    replay_command.add_argument("path")
+    replay_command.add_argument("game", type=int)
+    replay_command.add_argument("--shots", type=int, default=None)
+
+    show_command = commands.add_parser("show", help="показать партию в окне")
+    show_command.add_argument("path")
+    show_command.add_argument("game", type=int)
+    show_command.add_argument("--speed", type=float, default=10.0)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "simulate":
+        start = time.perf_counter()
+        with GameRecorder(args.path) as recorder:
+            for game in range(args.games):
+                engine = simulate_game(
+                    args.grid_size,
+                    seed=args.seed + game,
+                    difficulty=args.difficulty,
+                    player_difficulty=args.difficulty,
+                )
+                recorder.write_game(engine)
+        elapsed = time.perf_counter() - start
+        print(f"Записано {args.games} партий за {elapsed:.2f} с в {args.path}")
+        return
+
+    with GameLog(args.path) as log:
+        if args.command == "stats":
+            print_stats(log)
+        elif args.command == "replay":
+            record = log[args.game]
+            engine = replay(record, args.shots)
+            print(
+                f"Партия {args.game}: поле {record.grid_size}x{record.grid_size}, "
+                f"выстрелов {record.shot_count}, победитель {record.winner()}"
+            )
+            print(f"Игрок попал: {engine.player_hits}/{engine.total_ship_cells}")
+            print(f"Компьютер попал: {engine.computer_hits}/{engine.total_ship_cells}")
+        elif args.command == "show":
+            show(log[args.game], args.speed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
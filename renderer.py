@@ -0,0 +1,421 @@
+"""
+Экономная отрисовка окна игры.
+
+Сетка обоих полей и подписи рисуются один раз на фоновую поверхность.
+Картинки клеток (корабль, промах, попадание) тоже готовятся заранее.
+Каждый кадр сравниваются текущие поля с тем, что уже нарисовано, и
+перерисовываются только изменившиеся клетки. На экран отправляются только
+их прямоугольники (pygame.display.update), а не все окно целиком.
+Если ничего не изменилось, кадр почти ничего не стоит.
+
+Очень большие поля целиком в окно не влезают: их рисует ViewportRenderer,
+показывая только видимую часть (Viewport), которую можно листать и
+приближать. Стоимость кадра зависит от размера окна, а не поля.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+from engine import EMPTY, HIT, MISS, SHIP
+
+# задаем разные цвета, которые будем использовать
+WHITE = (255, 255, 255)  # белый для фона
+BLACK = (0, 0, 0)  # черный для сетки
+GRAY = (128, 128, 128)  # серый для промахов
+RED = (255, 0, 0)  # красный для попаданий
+BLUE = (0, 0, 255)  # синий для кораблей
+GREEN = (0, 255, 0)  # зеленый пока не используется, может пригодится
+
+# цвет, который считается прозрачным в картинках клеток
+TRANSPARENT = (255, 0, 255)
+
+
+class TextCache:
+    """
+    Готовые картинки надписей: font.render вызывается только для текста,
+    которого еще нет в кэше. Хранится не больше max_size надписей, при
+    переполнении выбрасывается та, что дольше всех не использовалась
+    """
+
+    def __init__(self, font, max_size=128):
+        self.font = font
+        self.max_size = max_size
+        self.surfaces = OrderedDict()  # (текст, цвет) -> картинка
+
+    def render(self, text, color=BLACK):
+        key = (text, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)  # недавно использована
+            return surface
+        surface = self.font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)  # самая давняя
+        return surface
+
+
+def make_cell_sprites(cell_size):
+    """
+    Картинки клеток для каждого состояния (так же, как рисует draw_ships)
+    """
+    sprites = {}
+    for state in (SHIP, MISS, HIT):
+        sprite = pygame.Surface((cell_size, cell_size))
+        sprite.fill(TRANSPARENT)
+        sprite.set_colorkey(TRANSPARENT)
+        if state == MISS:  # серый кружок (на мелких клетках - поменьше)
+            center = (cell_size // 2, cell_size // 2)
+            pygame.draw.circle(sprite, GRAY, center, min(5, max(1, cell_size // 4)))
+        else:  # синий (корабль) или красный (попадание) квадратик
+            color = BLUE if state == SHIP else RED
+            pygame.draw.rect(sprite, color, (0, 0, cell_size - 1, cell_size - 1))
+        sprites[state] = sprite.convert()
+    return sprites
+
+
+def field_state(field):
+    """
+    Поле движка в виде массива NumPy (поле из битовых масок переводится)
+    """
+    if isinstance(field, np.ndarray):
+        return field
+    return field.to_array()
+
+
+def visible_cells(field, x, y, width, height):
+    """
+    Непустые клетки поля в прямоугольнике width x height с углом в (x, y)
+    Возвращает список (x, y, значение)
+    """
+    if hasattr(field, "visible"):  # разреженное поле ищет само
+        return field.visible(x, y, width, height)
+    window = field_state(field)[y : y + height, x : x + width]
+    rows, columns = np.nonzero(window)
+    return [
+        (x + i, y + j, int(window[j, i]))
+        for j, i in zip(rows.tolist(), columns.tolist())
+    ]
+
+
+class BoardRenderer:
+    """
+    Общая часть DirtyRenderer и ViewportRenderer: фон с подписями,
+    полоса сообщений и перерисовка окна целиком
+    """
+
+    def __init__(self, screen, text_cache, boards, labels, status_center):
+        """
+        screen - окно pygame
+        text_cache - кэш надписей (TextCache) для подписей и сообщений
+        boards - левый верхний угол каждого поля [(x, y), ...]
+        labels - неизменные подписи [(текст, (x, y)), ...]
+        status_center - точка (x, y), относительно которой по вертикали
+        сдвигаются сообщения (как в display_message)
+        """
+        self.screen = screen
+        self.text_cache = text_cache
+        self.boards = boards
+        self.status_center = status_center
+
+        # фон: белое окно с подписями (наследники дорисовывают свое),
+        # рисуется один раз
+        self.background = pygame.Surface(screen.get_size()).convert()
+        self.background.fill(WHITE)
+        for text, position in labels:
+            self.background.blit(text_cache.render(text), position)
+
+        # сообщения занимают полосу во всю ширину окна вокруг status_center
+        height = text_cache.font.get_linesize()
+        self.status_rect = pygame.Rect(
+            0, status_center[1] - 60 - height, screen.get_width(), 120 + 2 * height
+        )
+
+    def redraw(self):
+        """
+        Забывает все, что нарисовано, и рисует фон заново
+        (нужно в начале и когда окно было закрыто другими окнами)
+        """
+        self.screen.blit(self.background, (0, 0))
+        self.drawn = [None] * len(self.boards)  # что нарисовано в каждом поле
+        self.drawn_messages = None
+        return [self.screen.get_rect()]
+
+    def _draw_messages(self, messages):
+        self.screen.blit(self.background, self.status_rect, self.status_rect)
+        center_x, center_y = self.status_center
+        for message, y_offset in messages:
+            text = self.text_cache.render(message)
+            self.screen.blit(
+                text, text.get_rect(center=(center_x, center_y + y_offset))
+            )
+        self.drawn_messages = list(messages)
+        return self.status_rect
+
+
+class DirtyRenderer(BoardRenderer):
+    """
+    Рисует поля и сообщения, обновляя на экране только то, что изменилось
+    """
+
+    def __init__(
+        self, screen, text_cache, grid_size, cell_size, boards, labels, status_center
+    ):
+        """
+        screen - окно pygame
+        text_cache - кэш надписей (TextCache) для подписей и сообщений
+        grid_size, cell_size - размер поля в клетках и клетки в пикселях
+        остальное - как у BoardRenderer
+        """
+        super().__init__(screen, text_cache, boards, labels, status_center)
+        self.grid_size = grid_size
+        self.cell_size = cell_size
+
+        # на фоне еще и сетки полей
+        for left, top in boards:
+            for i in range(grid_size):
+                for j in range(grid_size):
+                    rect = (left + j * cell_size, top + i * cell_size)
+                    pygame.draw.rect(
+                        self.background, BLACK, (*rect, cell_size, cell_size), 1
+                    )
+
+        self.sprites = make_cell_sprites(cell_size)
+        self.redraw()
+
+    def invalidate(self, rect):
+        """
+        Стирает кусок экрана до фона (например, после отладочной таблички
+        поверх полей); клетки и сообщения под ним перерисуются в update
+        Возвращает прямоугольник, который нужно обновить на экране
+        """
+        rect = pygame.Rect(rect)
+        self.screen.blit(self.background, rect, rect)
+        size = self.cell_size
+        for index, (left, top) in enumerate(self.boards):
+            drawn = self.drawn[index]
+            if drawn is None:
+                continue
+            # клетки поля, которые задевает прямоугольник
+            first_column = max(0, (rect.left - left) // size)
+            last_column = min(self.grid_size, (rect.right - left) // size + 1)
+            first_row = max(0, (rect.top - top) // size)
+            last_row = min(self.grid_size, (rect.bottom - top) // size + 1)
+            if first_column < last_column and first_row < last_row:
+                # -1 не совпадает ни с одним состоянием клетки
+                drawn[first_row:last_row, first_column:last_column] = -1
+        if rect.colliderect(self.status_rect):
+            self.drawn_messages = None
+        return rect
+
+    def update(self, fields, messages):
+        """
+        Дорисовывает изменения
+        fields - поля в том же порядке, что и boards
+        messages - список сообщений [(текст, сдвиг по y), ...]
+        Возвращает список прямоугольников, которые нужно обновить на экране
+        """
+        dirty = []
+        for index, field in enumerate(fields):
+            dirty.extend(self._update_board(index, field_state(field)))
+        if messages != self.drawn_messages:
+            dirty.append(self._draw_messages(messages))
+        return dirty
+
+    def _update_board(self, index, state):
+        drawn = self.drawn[index]
+        if drawn is None:  # поле еще не рисовали - рисуем все непустые клетки
+            rows, columns = np.nonzero(state != EMPTY)
+        else:
+            rows, columns = np.nonzero(state != drawn)
+        self.drawn[index] = state.copy()
+
+        left, top = self.boards[index]
+        size = self.cell_size
+        dirty = []
+        for i, j in zip(rows.tolist(), columns.tolist()):
+            rect = pygame.Rect(left + j * size, top + i * size, size, size)
+            # возвращаем кусок фона и рисуем поверх картинку клетки
+            self.screen.blit(self.background, rect, rect)
+            value = int(state[i, j])
+            if value != EMPTY:
+                self.screen.blit(self.sprites[value], rect)
+            dirty.append(rect)
+        return dirty
+
+
+class Viewport:
+    """
+    Видимая часть большого поля: левая верхняя клетка и размер клетки
+    в пикселях. Одна и та же для обоих полей, чтобы они листались вместе
+    """
+
+    def __init__(self, grid_size, pixels, cell_size, min_cell_size=4):
+        """
+        grid_size - размер поля в клетках
+        pixels - сторона квадрата, в котором рисуется поле
+        cell_size - начальный размер клетки (он же самый крупный)
+        min_cell_size - самый мелкий размер клетки
+        """
+        self.grid_size = grid_size
+        self.pixels = pixels
+        self.max_cell_size = cell_size
+        # мельче, чем нужно, чтобы все поле влезло целиком, не уменьшаем
+        self.min_cell_size = max(min_cell_size, min(cell_size, pixels // grid_size))
+        self.cell_size = cell_size
+        self.x = 0
+        self.y = 0
+
+    @property
+    def cells(self):
+        """
+        Сколько клеток видно по каждой стороне
+        """
+        return min(self.grid_size, self.pixels // self.cell_size)
+
+    @property
+    def key(self):
+        return self.x, self.y, self.cell_size
+
+    def scroll(self, dx, dy):
+        """
+        Сдвигает видимую часть на dx, dy клеток (не дальше края поля)
+        """
+        limit = self.grid_size - self.cells
+        self.x = max(0, min(limit, self.x + dx))
+        self.y = max(0, min(limit, self.y + dy))
+
+    def zoom(self, steps, anchor=None):
+        """
+        Меняет размер клетки (steps > 0 - крупнее), клетка anchor (x, y)
+        остается на том же месте экрана
+        """
+        old_size = self.cell_size
+        new_size = old_size
+        for _ in range(abs(steps)):
+            if steps > 0:
+                new_size = new_size * 5 // 4 + 1
+            else:
+                new_size = new_size * 4 // 5
+        new_size = max(self.min_cell_size, min(self.max_cell_size, new_size))
+        if new_size == old_size:
+            return
+        if anchor is None:  # по умолчанию - центр видимой части
+            anchor = (self.x + self.cells // 2, self.y + self.cells // 2)
+        offset_x = (anchor[0] - self.x) * old_size
+        offset_y = (anchor[1] - self.y) * old_size
+        self.cell_size = new_size
+        self.x = anchor[0] - offset_x // new_size
+        self.y = anchor[1] - offset_y // new_size
+        self.scroll(0, 0)  # возвращаем в пределы поля
+
+    def cell_at(self, px, py):
+        """
+        Клетка (x, y) под точкой (px, py) относительно угла поля или None
+        """
+        if px < 0 or py < 0:
+            return None
+        i, j = px // self.cell_size, py // self.cell_size
+        if i >= self.cells or j >= self.cells:
+            return None
+        return self.x + i, self.y + j
+
+
+class ViewportRenderer(BoardRenderer):
+    """
+    Рисует большие поля через Viewport: только видимые клетки, сколько
+    бы клеток ни было в поле. Видимая часть поля перерисовывается целиком,
+    но только если в ней что-то изменилось (или ее сдвинули)
+    """
+
+    def __init__(self, screen, text_cache, viewport, boards, labels, status_center):
+        """
+        screen - окно pygame
+        text_cache - кэш надписей (TextCache)
+        viewport - видимая часть полей (Viewport)
+        остальное - как у BoardRenderer
+        """
+        super().__init__(screen, text_cache, boards, labels, status_center)
+        self.viewport = viewport
+        self.sprites = {}  # размер клетки -> картинки клеток
+        self.redraw()
+
+    def board_rect(self, index):
+        """
+        Прямоугольник поля вместе с подписью видимых клеток под ним
+        """
+        left, top = self.boards[index]
+        pixels = self.viewport.pixels
+        return pygame.Rect(
+            left, top, pixels + 1, pixels + self.text_cache.font.get_linesize() + 5
+        )
+
+    def invalidate(self, rect):
+        """
+        Стирает кусок экрана до фона, задетые поля и сообщения
+        перерисуются в update
+        """
+        rect = pygame.Rect(rect)
+        self.screen.blit(self.background, rect, rect)
+        for index in range(len(self.boards)):
+            if rect.colliderect(self.board_rect(index)):
+                self.drawn[index] = None
+        if rect.colliderect(self.status_rect):
+            self.drawn_messages = None
+        return rect
+
+    def update(self, fields, messages):
+        """
+        Дорисовывает изменения (как DirtyRenderer.update)
+        Возвращает список прямоугольников, которые нужно обновить на экране
+        """
+        viewport = self.viewport
+        count = viewport.cells
+        dirty = []
+        for index, field in enumerate(fields):
+            cells = visible_cells(field, viewport.x, viewport.y, count, count)
+            state = (viewport.key, cells)
+            if state != self.drawn[index]:
+                dirty.append(self._draw_board(index, cells))
+                self.drawn[index] = state
+        if messages != self.drawn_messages:
+            dirty.append(self._draw_messages(messages))
+        return dirty
+
+    def _draw_board(self, index, cells):
+        viewport = self.viewport
+        size = viewport.cell_size
+        count = viewport.cells
+        left, top = self.boards[index]
+        rect = self.board_rect(index)
+        self.screen.blit(self.background, rect, rect)
+
+        # сетка - линиями, а не квадратиком на каждую клетку
+        end = count * size
+        for k in range(count + 1):
+            pygame.draw.line(
+                self.screen, BLACK, (left + k * size, top), (left + k * size, top + end)
+            )
+            pygame.draw.line(
+                self.screen, BLACK, (left, top + k * size), (left + end, top + k * size)
+            )
+
+        sprites = self.sprites.get(size)
+        if sprites is None:
+            sprites = self.sprites[size] = make_cell_sprites(size)
+        for x, y, value in cells:
+            position = (
+                left + (x - viewport.x) * size,
+                top + (y - viewport.y) * size,
+            )
+            self.screen.blit(sprites[value], position)
+
+        # какие клетки сейчас видно
+        caption = (
+            f"x {viewport.x}-{viewport.x + count - 1}, "
+            f"y {viewport.y}-{viewport.y + count - 1} из {viewport.grid_size}"
+        )
+        self.screen.blit(self.text_cache.render(caption), (left, top + end + 5))
+        return rect
@@ -0,0 +1,101 @@
+"""
+Разреженное поле "Морского боя" для очень больших досок.
+
+Хранятся только непустые клетки: словарь {(y, x): значение}. Память и
+время выстрела зависят от числа кораблей и выстрелов, а не от площади
+поля, поэтому можно играть на полях 100x100 и больше.
+
+Поле можно выбрать в движке вместо массива NumPy:
+BattleshipEngine(field_type="sparse"). Клетки читаются и пишутся так же:
+field[y, x].
+"""
+
+import numpy as np
+
+from engine import EMPTY, HIT, MISS, SHIP
+
+
+class SparseField:
+    """
+    Поле, в котором хранятся только непустые клетки
+    """
+
+    def __init__(self, grid_size):
+        self.grid_size = grid_size
+        self.shape = (grid_size, grid_size)
+        self.cells = {}  # (y, x) -> SHIP / MISS / HIT
+
+    def __getitem__(self, cell):
+        return self.cells.get(cell, EMPTY)
+
+    def __setitem__(self, cell, value):
+        if value == EMPTY:
+            self.cells.pop(cell, None)
+        else:
+            self.cells[cell] = value
+
+    def can_place_ship(self, x, y, size, horizontal):
+        """
+        Можно ли поставить корабль: он влезает в поле, а ни он сам,
+        ни клетки вокруг него не заняты
+        """
+        width, height = (size, 1) if horizontal else (1, size)
+        if x < 0 or y < 0 or x + width > self.grid_size or y + height > self.grid_size:
+            return False
+        cells = self.cells
+        for j in range(y - 1, y + height + 1):
+            for i in range(x - 1, x + width + 1):
+                if (j, i) in cells:
+                    return False
+        return True
+
+    def place_ship(self, x, y, size, horizontal):
+        """
+        Ставит корабль (проверку нужно сделать заранее через can_place_ship)
+        """
+        for k in range(size):
+            if horizontal:
+                self.cells[(y, x + k)] = SHIP
+            else:
+                self.cells[(y + k, x)] = SHIP
+
+    def fire(self, x, y):
+        """
+        Выстрел по клетке: возвращает MISS или HIT, либо None, если сюда уже стреляли
+        """
+        value = self.cells.get((y, x), EMPTY)
+        if value == EMPTY:
+            self.cells[(y, x)] = MISS
+            return MISS
+        if value == SHIP:
+            self.cells[(y, x)] = HIT
+            return HIT
+        return None
+
+    def visible(self, x, y, width, height):
+        """
+        Непустые клетки в прямоугольнике: список (x, y, значение)
+        Перебирается то, что меньше: клетки прямоугольника или непустые клетки
+        """
+        if width * height < len(self.cells):
+            cells = self.cells
+            return [
+                (i, j, cells[(j, i)])
+                for j in range(y, y + height)
+                for i in range(x, x + width)
+                if (j, i) in cells
+            ]
+        return [
+            (i, j, value)
+            for (j, i), value in self.cells.items()
+            if x <= i < x + width and y <= j < y + height
+        ]
+
+    def to_array(self):
+        """
+        То же поле в виде массива NumPy (только для небольших полей)
+        """
+        array = np.zeros(self.shape, dtype=np.int8)
+        for cell, value in self.cells.items():
+            array[cell] = value
+        return array
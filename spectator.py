@@ -0,0 +1,275 @@
+"""
+Зрительский режим: компьютер против компьютера в окне игры.
+
+Слева играет одна стратегия (за игрока), справа - другая (компьютер
+движка). Партии идут одна за другой без пауз между выстрелами, а окно
+рисуется отдельно от игры:
+- по умолчанию - display_fps раз в секунду, сколько бы выстрелов
+  ни прошло между кадрами (тысячи партий в минуту)
+- с render_every=N - кадр после каждых N выстрелов
+- с speed=S - не быстрее S выстрелов в секунду (чтобы успевать смотреть)
+Внизу окна - счет и статистика по всем сыгранным партиям.
+
+Пробел - пауза, F3 - замеры кадра (как в main.py).
+
+Пример запуска:
+    python spectator.py --left smart --right random --grid-size 10
+"""
+
+import os
+
+# без приветствия pygame в консоли; задать до импорта pygame
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import random
+import time
+
+import pygame
+
+from ai import make_ai
+from engine import GRID_SIZE, calculate_ships_for_grid
+from main import BattleshipGame
+
+DISPLAY_FPS = 30  # сколько кадров в секунду показывать
+STEP_BATCH = 16  # выстрелов между проверками времени
+
+
+class SpectatorGame(BattleshipGame):
+    """
+    Окно, в котором две стратегии играют партию за партией
+    """
+
+    def __init__(
+        self,
+        grid_size=GRID_SIZE,
+        ships=None,
+        left="smart",
+        right="smart",
+        render_every=0,
+        display_fps=DISPLAY_FPS,
+        speed=0,
+        seed=None,
+        large_board=None,
+        record_path=None,
+        profile=False,
+    ):
+        """
+        left, right - стратегии левого и правого компьютера (см. ai.py)
+        render_every - рисовать кадр после каждых N выстрелов
+        (0 - display_fps кадров в секунду)
+        display_fps - сколько кадров в секунду показывать
+        speed - не больше стольких выстрелов в секунду (0 - без ограничения)
+        seed - зерно для повторяемой серии партий
+        record_path - файл, в который дописываются все сыгранные партии
+        """
+        super().__init__(
+            grid_size,
+            ships,
+            difficulty=right,
+            fps=display_fps,
+            computer_delay=0,
+            profile=profile,
+            large_board=large_board,
+            record_path=record_path,
+            board_labels=(f"Компьютер 1: {left}", f"Компьютер 2: {right}"),
+        )
+        pygame.display.set_caption("Морской бой: компьютер против компьютера")
+        self.left = left
+        self.right = right
+        self.render_every = render_every
+        self.display_fps = display_fps
+        self.speed = speed
+        self.seeds = random.Random(seed)  # зерна партий
+        self.paused = False
+        self.shot_budget = 0.0  # сколько выстрелов накопилось при speed > 0
+
+        # статистика по всем партиям
+        self.games = 0
+        self.wins = [0, 0]  # победы левого и правого
+        self.total_shots = 0
+        self.started = time.perf_counter()
+
+        self.new_game()
+
+    def new_game(self):
+        """
+        Начинает следующую партию в том же окне
+        """
+        # сбрасываем только партию: окно, рендерер, таблицы расстановок
+        # и статистика остаются; у каждой партии свое зерно
+        self.random.seed(self.seeds.getrandbits(32))
+        self.reset_game()
+        self.place_computer_ships()
+        self.place_player_ships_randomly()
+        self.left_ai = make_ai(self.left, self.grid_size, self.ships, self.random)
+
+    def step(self):
+        """
+        Один выстрел того, чей сейчас ход; законченная партия
+        попадает в статистику, и сразу начинается новая
+        """
+        if self.is_player_turn:
+            x, y = self.left_ai.choose_shot()
+            result = self.player_shot(x, y)
+            self.left_ai.observe(x, y, result, self.last_sunk)
+        else:
+            self.computer_move()
+        if self.game_over:
+            self.finish_game()
+
+    def finish_game(self):
+        self.games += 1
+        self.wins[0 if self.computer_fleet.ships_left == 0 else 1] += 1
+        self.total_shots += len(self.shot_log)
+        if self.recorder is not None:
+            self.recorder.write_game(self)
+        self.new_game()
+
+    def advance(self, frame_start):
+        """
+        Играет до следующего кадра
+        Возвращает, сколько выстрелов сделано
+        """
+        if self.paused:
+            return 0
+        if self.speed > 0:
+            # ровно столько выстрелов, сколько положено за кадр
+            self.shot_budget += self.speed / self.display_fps
+            steps = int(self.shot_budget)
+            self.shot_budget -= steps
+        elif self.render_every > 0:
+            steps = self.render_every
+        else:
+            # сколько успеем до следующего кадра
+            deadline = frame_start + 1 / self.display_fps
+            steps = 0
+            while time.perf_counter() < deadline:
+                for _ in range(STEP_BATCH):
+                    self.step()
+                steps += STEP_BATCH
+            return steps
+        for _ in range(steps):
+            self.step()
+        return steps
+
+    def status_messages(self):
+        """
+        Счет и статистика вместо подсказок для игрока
+        """
+        key = (self.games, self.paused)
+        if key != self.status_key:
+            self.status_key = key
+            self.status_cache = self.build_status_messages()
+        return self.status_cache
+
+    def build_status_messages(self):
+        games = self.games
+        minutes = (time.perf_counter() - self.started) / 60
+        messages = [
+            (
+                (
+                    f"Партий: {games} ({games / minutes:.0f} в минуту)"
+                    if minutes > 0
+                    else f"Партий: {games}"
+                ),
+                -60,
+            )
+        ]
+        if games:
+            left, right = self.wins
+            messages.append(
+                (
+                    f"Побед: {self.left} {left} ({100 * left / games:.1f}%), "
+                    f"{self.right} {right} ({100 * right / games:.1f}%)",
+                    -20,
+                )
+            )
+            messages.append(
+                (f"Выстрелов за партию: {self.total_shots / games:.1f}", 20)
+            )
+        hint = "Пауза (пробел - продолжить)" if self.paused else "Пробел - пауза"
+        messages.append((hint, 60))
+        return messages
+
+    def run(self):
+        """
+        Цикл зрительского режима: игра и показ кадров по очереди
+        """
+        clock = pygame.time.Clock()
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
+        profiler = self.profiler
+        running = True
+        while running:
+            frame_start = time.perf_counter()
+            profiler.begin_frame()
+            with profiler.section("events"):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+                    elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+                        self.paused = not self.paused
+                    elif event.type == pygame.KEYDOWN:
+                        self.handle_key(event.key)
+                    elif event.type == pygame.MOUSEWHEEL:
+                        self.handle_wheel(event.y)
+                    elif (
+                        event.type == pygame.WINDOWEXPOSED and self.renderer is not None
+                    ):
+                        pygame.display.update(self.renderer.redraw())
+
+            with profiler.section("simulate"):
+                self.advance(frame_start)
+            self.draw_frame()
+
+            # без ограничения скорости кадр и так занял все свое время
+            if self.paused or self.speed > 0:
+                with profiler.section("wait"):
+                    clock.tick(self.display_fps)
+            profiler.end_frame()
+
+        if self.recorder is not None:
+            self.recorder.close()
+        pygame.quit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Морской бой: компьютер против компьютера"
+    )
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE)
+    parser.add_argument("--fill-ratio", type=float, default=0.25)
+    parser.add_argument("--left", default="smart", help="стратегия слева")
+    parser.add_argument("--right", default="random", help="стратегия справа")
+    parser.add_argument(
+        "--every",
+        type=int,
+        default=0,
+        help="кадр после каждых N выстрелов (0 - по времени)",
+    )
+    parser.add_argument("--display-fps", type=int, default=DISPLAY_FPS)
+    parser.add_argument(
+        "--speed", type=float, default=0, help="выстрелов в секунду (0 - максимум)"
+    )
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--record", help="дописывать партии в этот файл")
+    parser.add_argument("--profile", action="store_true", help="замерять кадры")
+    args = parser.parse_args(argv)
+
+    game = SpectatorGame(
+        args.grid_size,
+        calculate_ships_for_grid(args.grid_size, args.fill_ratio),
+        left=args.left,
+        right=args.right,
+        render_every=args.every,
+        display_fps=args.display_fps,
+        speed=args.speed,
+        seed=args.seed,
+        record_path=args.record,
+        profile=args.profile,
+    )
+    game.run()
+
+
+if __name__ == "__main__":
+    main()
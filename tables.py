@@ -0,0 +1,129 @@
+"""
+Кэш таблиц, которые зависят только от конфигурации поля.
+
+Таблица всех расстановок кораблей (placement.py), маски расстановок
+(bitboard.py), обратный индекс "клетка -> расстановки" (ai.py) и проверка,
+влезает ли флот, для одного и того же поля и флота всегда одинаковые.
+Поэтому каждая таблица строится один раз:
+- в памяти хранятся последние MEMORY_SIZE таблиц (вытесняется самая давно
+  нужная)
+- на диске - файлы pickle в CACHE_DIR, так что следующий запуск игры
+  (или процесс турнира) загружает таблицу, а не строит заново
+
+Если поменялся способ построения таблиц, нужно увеличить VERSION -
+старые файлы тогда просто не подойдут и таблицы построятся заново.
+Каталог кэша можно задать переменной окружения SEA_WAR_CACHE_DIR,
+пустое значение отключает кэш на диске.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+VERSION = 1  # версия формата таблиц
+MEMORY_SIZE = 64  # сколько таблиц держать в памяти
+CACHE_DIR = os.environ.get(
+    "SEA_WAR_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "sea-war")
+)
+
+
+class TableCache:
+    """
+    Таблицы по ключу (вид таблицы, параметры): сначала из памяти,
+    потом с диска, и только потом строятся заново
+    directory - каталог для файлов (None или "" - без диска)
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_size=MEMORY_SIZE):
+        self.directory = directory or None
+        self.max_size = max_size
+        self.tables = OrderedDict()
+        self.lock = threading.Lock()  # окно игры строит таблицы и в потоке AI
+        # сколько раз таблица нашлась в памяти, на диске или строилась
+        self.hits = self.loads = self.builds = 0
+
+    def get(self, kind, builder, *key):
+        """
+        Таблица вида kind для параметров key; если ее нет ни в памяти,
+        ни на диске - строится вызовом builder(*key)
+        """
+        cache_key = (kind,) + key
+        with self.lock:
+            if cache_key in self.tables:
+                self.tables.move_to_end(cache_key)
+                self.hits += 1
+                return self.tables[cache_key]
+
+        table = self._load(cache_key)
+        if table is None:
+            table = builder(*key)
+            self.builds += 1
+            self._save(cache_key, table)
+        else:
+            self.loads += 1
+
+        with self.lock:
+            self.tables[cache_key] = table
+            self.tables.move_to_end(cache_key)
+            if len(self.tables) > self.max_size:
+                self.tables.popitem(last=False)
+        return table
+
+    def path(self, cache_key):
+        # параметры могут быть длинными (флот), поэтому в имени - их хэш
+        digest = hashlib.sha1(repr(cache_key).encode()).hexdigest()[:16]
+        return os.path.join(
+            self.directory, f"{cache_key[0]}-v{VERSION}-{digest}.pickle"
+        )
+
+    def _load(self, cache_key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self.path(cache_key), "rb") as file:
+                version, stored_key, table = pickle.load(file)
+        except Exception:
+            # файла нет, он испорчен или чужой - построим таблицу заново
+            return None
+        if version != VERSION or stored_key != cache_key:
+            return None
+        return table
+
+    def _save(self, cache_key, table):
+        if self.directory is None:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # пишем во временный файл и переименовываем, чтобы другой процесс
+            # не прочитал недописанную таблицу
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump((VERSION, cache_key, table), file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.path(cache_key))
+        except OSError:
+            # нет места или прав - работаем без диска
+            pass
+
+    def clear(self, disk=False):
+        """
+        Забывает таблицы в памяти (и файлы на диске, если disk=True)
+        """
+        with self.lock:
+            self.tables.clear()
+        if disk and self.directory is not None and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".pickle"):
+                    os.remove(os.path.join(self.directory, name))
+
+
+cache = TableCache()
+
+
+def cached_table(kind, builder, *key):
+    """
+    Таблица из общего кэша (см. TableCache.get)
+    """
+    return cache.get(kind, builder, *key)
@@ -0,0 +1,22 @@
+"""
+Общие настройки тестов: модули игры лежат в корне репозитория,
+а таблицы (tables.py) не читаются и не пишутся на диск
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def fresh_tables(monkeypatch):
+    # каждый тест строит таблицы и проверяет флот сам, а не берет из кэша
+    from tables import cache
+
+    monkeypatch.setattr(cache, "directory", None)
+    cache.clear()
+    yield
+    cache.clear()
@@ -0,0 +1,14 @@
+import asyncio
+
+import pytest
+
+from network import load_test
+
+
+# 150 - большое поле: боты расставляют корабли без таблицы всех расстановок
+# (см. default_placement в engine.py), а клетки передаются 4 байтами
+@pytest.mark.parametrize("grid_size", [8, 150])
+def test_load_test(grid_size):
+    stats = asyncio.run(load_test(1, grid_size))
+    assert stats["finished"] == 1
+    assert stats["wins"] == 1
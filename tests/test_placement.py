@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from engine import can_place_ship, new_field, place_ship
+from placement import FleetGenerator, ImpossibleFleetError, check_fleet
+
+
+def assert_valid_fleet(grid_size, ships, fleet):
+    """
+    Флот тот, что просили, и корабли не касаются друг друга
+    """
+    sizes = {}
+    for _, _, size, _ in fleet:
+        sizes[size] = sizes.get(size, 0) + 1
+    assert sizes == ships
+    field = new_field(grid_size)
+    for x, y, size, horizontal in fleet:
+        assert can_place_ship(field, x, y, size, horizontal)
+        place_ship(field, x, y, size, horizontal)
+
+
+@pytest.mark.parametrize(
+    "grid_size, ships",
+    [
+        (120, {2: 100, 1: 1000}),  # случайная расстановка с первой попытки
+        (80, {1: 1100}),  # плотный флот - полный перебор по порядку
+    ],
+)
+def test_fleet_of_thousand_ships(grid_size, ships):
+    # перебор без рекурсии: тысячи кораблей не упираются в предел глубины
+    fleet = FleetGenerator(grid_size, ships).sample(random.Random(0))
+    assert_valid_fleet(grid_size, ships, fleet)
+
+
+def test_impossible_fleet():
+    with pytest.raises(ImpossibleFleetError):
+        check_fleet(7, ((2, 4), (3, 4), (1, 4)))
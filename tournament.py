@@ -0,0 +1,368 @@
+"""
+Турнир стратегий компьютер против компьютера.
+
+Участник турнира - это стратегия стрельбы (см. DIFFICULTIES в ai.py)
+и способ расстановки кораблей (см. PLACEMENTS в engine.py), например
+"smart/generator" или "random/rejection". Каждая пара участников играет
+заданное число партий, по очереди начиная первой. Партии раздаются
+процессам из пула, у каждой партии свое зерно, поэтому результат не
+зависит от числа процессов и порядка, в котором партии доиграны.
+
+Результаты каждой партии сразу дописываются строкой JSON в файл, так что
+долгий турнир можно прервать и продолжить с флагом --resume. Первая строка
+файла - настройки турнира (участники, партии, поле, флот, зерно): продолжить
+можно только турнир с теми же настройками.
+
+Пример запуска:
+    python tournament.py --games 1000 --output results.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import os
+import statistics
+import time
+from multiprocessing import Pool
+
+from ai import DIFFICULTIES, make_ai
+from engine import GRID_SIZE, PLACEMENTS, BattleshipEngine, calculate_ships_for_grid
+
+# в турнире Монте-Карло считает ровно столько расстановок на выстрел, а не
+# "сколько успеет": иначе результат зависел бы от скорости машины, а не от зерна
+MONTECARLO_SAMPLES = 200
+AI_OPTIONS = {"montecarlo": {"samples": MONTECARLO_SAMPLES, "workers": 0}}
+
+# все сочетания "стратегия/расстановка"; Монте-Карло по умолчанию не играет -
+# партия с ним идет в сотни раз дольше (его можно указать явно)
+ENTRANTS = [
+    f"{difficulty}/{placement}"
+    for difficulty in DIFFICULTIES
+    if difficulty != "montecarlo"
+    for placement in PLACEMENTS
+]
+
+
+def parse_entrant(entrant):
+    """
+    Разбирает "стратегия/расстановка" (расстановку можно не указывать)
+    Возвращает (стратегия, расстановка)
+    """
+    difficulty, _, placement = entrant.partition("/")
+    placement = placement or "generator"
+    if difficulty not in DIFFICULTIES or placement not in PLACEMENTS:
+        raise ValueError(
+            f"Неизвестный участник: {entrant} (стратегии: {', '.join(DIFFICULTIES)}, "
+            f"расстановки: {', '.join(PLACEMENTS)})"
+        )
+    return difficulty, placement
+
+
+def game_seed(seed, game_id):
+    """
+    Зерно одной партии: зависит только от общего зерна и номера партии
+    """
+    return f"{seed}:{game_id}"
+
+
+def play_game(task):
+    """
+    Играет одну партию
+    task - (номер партии, первый участник, второй участник, размер поля,
+    флот, общее зерно); первый участник стреляет первым
+    Возвращает словарь с результатом партии
+    """
+    game_id, first, second, grid_size, ships, seed = task
+    first_ai, first_placement = parse_entrant(first)
+    second_ai, second_placement = parse_entrant(second)
+
+    # первый участник играет за "игрока", второй - за компьютер движка
+    engine = BattleshipEngine(
+        grid_size,
+        ships,
+        game_seed(seed, game_id),
+        difficulty=second_ai,
+        placement=second_placement,
+        ai_options=AI_OPTIONS.get(second_ai),
+    )
+    engine.place_player_ships_randomly(first_placement)
+
+    player_ai = make_ai(
+        first_ai, grid_size, engine.ships, engine.random, **AI_OPTIONS.get(first_ai, {})
+    )
+
+    shots = [0, 0]  # выстрелы первого и второго участника
+    while not engine.game_over:
+        if engine.is_player_turn:
+            x, y = player_ai.choose_shot()
+            result = engine.player_shot(x, y)
+            player_ai.observe(x, y, result, engine.last_sunk)
+            shots[0] += 1
+        else:
+            engine.computer_move()
+            shots[1] += 1
+
+    first_won = engine.computer_fleet.ships_left == 0
+    return {
+        "game": game_id,
+        "first": first,
+        "second": second,
+        "winner": first if first_won else second,
+        "shots": shots[0] if first_won else shots[1],  # выстрелов до победы
+    }
+
+
+def make_tasks(entrants, games, grid_size, ships, seed):
+    """
+    Партии кругового турнира: каждая пара играет games партий,
+    в четных партиях первым стреляет один участник, в нечетных - другой
+    """
+    tasks = []
+    for pair_index, (a, b) in enumerate(itertools.combinations(entrants, 2)):
+        for k in range(games):
+            game_id = pair_index * games + k
+            first, second = (a, b) if k % 2 == 0 else (b, a)
+            tasks.append((game_id, first, second, grid_size, ships, seed))
+    return tasks
+
+
+def tournament_config(entrants, games, grid_size, ships, seed):
+    """
+    Настройки турнира в том виде, в каком они записываются в файл
+    (флот - списком пар [размер, количество]: ключи JSON бывают только строками)
+    """
+    return {
+        "entrants": list(entrants),
+        "games": games,
+        "grid_size": grid_size,
+        "ships": sorted([size, count] for size, count in ships.items()),
+        "seed": seed,
+        "ai_options": AI_OPTIONS,
+    }
+
+
+def write_header(file, config):
+    file.write(json.dumps({"config": config}, ensure_ascii=False) + "\n")
+
+
+def load_results(path):
+    """
+    Читает настройки и уже сыгранные партии из файла
+    Возвращает (настройки, список партий); настройки - None, если файла нет,
+    он пустой или записан без настроек
+    Недописанная последняя строка (турнир прервали) пропускается
+    """
+    config = None
+    results = []
+    if not os.path.exists(path):
+        return config, results
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if "config" in row:
+                config = row["config"]
+            else:
+                results.append(row)
+    return config, results
+
+
+def _init_worker(grid_size, ships):
+    """
+    Подготовка процесса: таблицы расстановок строятся один раз на процесс,
+    а не в первой партии каждого участника
+    """
+    BattleshipEngine(grid_size, ships, seed=0, difficulty="smart")
+
+
+def run_tournament(tasks, output, workers=None, chunksize=None):
+    """
+    Играет партии в пуле процессов и дописывает результаты в файл
+    по мере готовности
+    Возвращает список результатов в порядке окончания партий
+    """
+    if not tasks:
+        return []
+    workers = workers or os.cpu_count() or 1
+    grid_size, ships = tasks[0][3], tasks[0][4]
+    if chunksize is None:
+        # партия длится около миллисекунды - отдаем процессам пачками,
+        # чтобы пересылка задач не съедала время
+        chunksize = max(1, min(64, len(tasks) // (workers * 8)))
+
+    results = []
+    with open(output, "a", encoding="utf-8") as file:
+        if workers == 1:
+            _init_worker(grid_size, ships)
+            finished = map(play_game, tasks)
+            pool = None
+        else:
+            pool = Pool(workers, _init_worker, (grid_size, ships))
+            finished = pool.imap_unordered(play_game, tasks, chunksize)
+        try:
+            for result in finished:
+                file.write(json.dumps(result, ensure_ascii=False) + "\n")
+                results.append(result)
+        finally:
+            file.flush()
+            if pool is not None:
+                pool.terminate()
+    return results
+
+
+def percentile(values, fraction):
+    """
+    Значение, меньше которого доля fraction отсортированных значений
+    """
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarize(results, entrants):
+    """
+    Статистика по участникам: партии, победы и выстрелы до победы
+    """
+    summary = {}
+    for entrant in entrants:
+        played = [r for r in results if entrant in (r["first"], r["second"])]
+        wins = sorted(r["shots"] for r in played if r["winner"] == entrant)
+        stats = {
+            "games": len(played),
+            "wins": len(wins),
+            "win_rate": len(wins) / len(played) if played else 0.0,
+        }
+        if wins:
+            stats.update(
+                shots_min=wins[0],
+                shots_median=statistics.median(wins),
+                shots_mean=statistics.fmean(wins),
+                shots_p90=percentile(wins, 0.9),
+                shots_max=wins[-1],
+            )
+        summary[entrant] = stats
+    return summary
+
+
+def print_report(summary, results, grid_size):
+    """
+    Печатает таблицу участников и распределение выстрелов до победы
+    """
+    print(
+        f"{'участник':<20}{'партий':>8}{'побед':>8}{'доля':>8}"
+        f"{'мин':>6}{'медиана':>9}{'среднее':>9}{'p90':>6}{'макс':>6}"
+    )
+    for entrant, stats in summary.items():
+        line = (
+            f"{entrant:<20}{stats['games']:>8}{stats['wins']:>8}"
+            f"{stats['win_rate']:>8.1%}"
+        )
+        if stats["wins"]:
+            line += (
+                f"{stats['shots_min']:>6}{stats['shots_median']:>9.1f}"
+                f"{stats['shots_mean']:>9.1f}{stats['shots_p90']:>6}"
+                f"{stats['shots_max']:>6}"
+            )
+        print(line)
+
+    # гистограмма выстрелов до победы по корзинам шириной в размер поля
+    print("\nВыстрелы до победы:")
+    for entrant in summary:
+        wins = [r["shots"] for r in results if r["winner"] == entrant]
+        if not wins:
+            continue
+        counts = {}
+        for shots in wins:
+            bucket = shots // grid_size * grid_size
+            counts[bucket] = counts.get(bucket, 0) + 1
+        print(entrant)
+        top = max(counts.values())
+        for bucket in sorted(counts):
+            bar = "#" * max(1, round(40 * counts[bucket] / top))
+            print(
+                f"  {bucket:>4}-{bucket + grid_size - 1:<4} {counts[bucket]:>7} {bar}"
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Турнир стратегий морского боя")
+    parser.add_argument(
+        "entrants",
+        nargs="*",
+        default=ENTRANTS,
+        help=f"участники вида стратегия/расстановка (по умолчанию все: "
+        f"{' '.join(ENTRANTS)})",
+    )
+    parser.add_argument(
+        "--games", type=int, default=100, help="партий на каждую пару участников"
+    )
+    parser.add_argument("--grid-size", type=int, default=GRID_SIZE)
+    parser.add_argument("--seed", type=int, default=0, help="общее зерно турнира")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="процессов (по умолчанию все ядра)"
+    )
+    parser.add_argument("--chunksize", type=int, default=None)
+    parser.add_argument("--output", default="tournament.jsonl")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="продолжить турнир: партии из --output не переигрываются",
+    )
+    args = parser.parse_args(argv)
+
+    for entrant in args.entrants:
+        parse_entrant(entrant)  # сразу ругаемся на опечатки
+    if len(args.entrants) < 2:
+        parser.error("нужно хотя бы два участника")
+    ships = calculate_ships_for_grid(args.grid_size)
+    tasks = make_tasks(args.entrants, args.games, args.grid_size, ships, args.seed)
+
+    # через JSON, чтобы сравнивать с настройками из файла в одном виде
+    config = json.loads(
+        json.dumps(
+            tournament_config(
+                args.entrants, args.games, args.grid_size, ships, args.seed
+            )
+        )
+    )
+
+    previous = []
+    if args.resume:
+        stored, previous = load_results(args.output)
+        if stored is None and previous:
+            parser.error(f"в {args.output} нет настроек турнира, продолжить нельзя")
+        if stored is not None and stored != config:
+            # номера партий другого турнира означают другие партии
+            parser.error(
+                f"{args.output} - результаты турнира с другими настройками: {stored}"
+            )
+        done = {result["game"] for result in previous}
+        tasks = [task for task in tasks if task[0] not in done]
+        print(f"Уже сыграно: {len(previous)}, осталось: {len(tasks)}")
+    # переписываем файл: настройки и (при --resume) сыгранные партии
+    # без возможной обрезанной строки в конце
+    with open(args.output, "w", encoding="utf-8") as file:
+        write_header(file, config)
+        for result in previous:
+            file.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    start = time.perf_counter()
+    try:
+        results = run_tournament(tasks, args.output, args.workers, args.chunksize)
+    except KeyboardInterrupt:
+        print("\nПрервано, продолжить можно с флагом --resume")
+        return
+    elapsed = time.perf_counter() - start
+
+    print(f"Размер поля: {args.grid_size}x{args.grid_size}, флот: {ships}")
+    if results:
+        print(
+            f"Сыграно {len(results)} партий за {elapsed:.2f} с "
+            f"({len(results) / elapsed:.0f} партий/с)\n"
+        )
+    all_results = previous + results
+    print_report(summarize(all_results, args.entrants), all_results, args.grid_size)
+
+
+if __name__ == "__main__":
+    main()